@@ -7,10 +7,14 @@ import seaborn as sns
 import datetime
 import os
 import time
-import cota as ct
+import sys
 import pathlib 
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent))
+import indicadores
+import varredura
+
 
 
 def carregar_dados():
@@ -45,11 +49,18 @@ def tab (caminho_arquivo = (Path(__file__).parent.resolve() / 'analise',)):
 
 
 
-def analisar_ativo(dados_ativo):
-    analise_resultados = []
-    
-    for i in range(len(dados_ativo["simbolo"])):
-        simbolo = dados_ativo["simbolo"][i]
-        preco = dados_ativo["preço"][i]
-        variacao = dados_ativo["variação"][i]
-        variacao_porcentagem = dados_ativo["variação_porcentagem"][i]
+def analisar_ativo(dados_ativo, **parametros):
+    """Sinais de compra e venda (sequências, reversões, rompimentos e gaps) de um ou vários ativos
+
+    dados_ativo: tabela (ou dicionário de colunas) com "simbolo" e "preço" em ordem de
+    chegada; com "horario", cada sinal sai com o horário da cotação que completou o padrão.
+    Os parâmetros (sequencia, janela_rompimento, limiar_gap, zona_neutra) vão para a varredura.
+    """
+    df = pd.DataFrame(dados_ativo)
+    df["preço"] = pd.to_numeric(df["preço"], errors="coerce")
+    if "horario" not in df.columns:
+        # Sem horário: a posição de cada cotação na sequência do ativo
+        df["horario"] = df.groupby("simbolo").cumcount()
+
+    tickers, horarios, matriz = indicadores.montar_matriz(df, "simbolo", "horario", "preço")
+    return varredura.varrer(matriz, tickers, horarios, **parametros)
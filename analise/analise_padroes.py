@@ -13,32 +13,44 @@
 
 
 import pandas as pd
-import glob
+import numpy as np
+import argparse
+import json
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Configuração
 caminho = Path(__file__).parent.parent
 print(caminho)
+sys.path.append(str(caminho / 'banco' / 'connection'))
+import classBanco
+import classSnapshots
+import classTicks
+from movimento import DIRECOES, classificar_movimento
+
 PASTA_DADOS = caminho /'banco' / 'arquivos' / 'dado-do-dia' 
+# CSVs do legado.salvar_dados
+PASTA_LEGADO = caminho / 'arq' / 'src' / 'dado-do-dia'
+# Formato detectado de cada arquivo (encoding, separador, colunas), para não detectar de novo
+ARQUIVO_FORMATOS = Path(__file__).parent / 'formatos_detectados.json'
 ARQUIVO_SAIDA_SEQUENCIAL = "analise_sequencial.csv"
 ARQUIVO_SAIDA_HORARIO = "analise_horario.csv"
+# Checkpoint da análise incremental: último preço/horário de cada ticker e contadores por hora
+ARQUIVO_ESTADO = "analise_estado.json"
+# Rótulos do CSV sequencial, na ordem de movimento.DIRECOES (subiu, caiu, parado)
+MOVIMENTOS = ['SUBIU', 'CAIU', 'ESTÁVEL']
+COLUNAS_SEQUENCIAL = ['simbolo_limpo', 'data_limpa', 'preco_limpo', 'delta_valor', 'tipo_movimento', 'delta_tempo']
 
-def ler_csv_flexivel(caminho_arquivo):
-    """Tenta ler o arquivo com diferentes encodings e separadores"""
-    encodings = ['utf-8', 'latin-1', 'cp1252']
-    separadores = [',', ';']
-    
-    for enc in encodings:
-        for sep in separadores:
-            try:
-                df = pd.read_json(caminho_arquivo, sep=sep, encoding=enc)
-                if df.shape[1] > 1:
-                    return df
-            except Exception:
-                continue
-    return None
+ENCODINGS = ['utf-8', 'latin-1', 'cp1252']
+SEPARADORES = [',', ';']
+
+def ler_tabela(caminho_arquivo, formato, **kwargs):
+    if formato["tipo"] == "json":
+        with open(caminho_arquivo, encoding=formato["encoding"]) as f:
+            return pd.DataFrame(json.load(f))
+    return pd.read_csv(caminho_arquivo, sep=formato["sep"], encoding=formato["encoding"], dtype=str, **kwargs)
 
 def encontrar_coluna(df, possiveis_nomes):
     """Procura uma coluna no DataFrame ignorando maiúsculas/minúsculas"""
@@ -50,61 +62,205 @@ def encontrar_coluna(df, possiveis_nomes):
             return df.columns[index]
     return None
 
-def carregar_e_limpar_dados():
+def detectar_formato(caminho_arquivo):
+    """Descobre encoding, separador e colunas de um arquivo (None se não der para ler)"""
+    tipo = "json" if str(caminho_arquivo).endswith(".json") else "csv"
+
+    for enc in ENCODINGS:
+        for sep in (SEPARADORES if tipo == "csv" else [None]):
+            formato = {"tipo": tipo, "encoding": enc, "sep": sep}
+            try:
+                df = ler_tabela(caminho_arquivo, formato, nrows=5) if tipo == "csv" else ler_tabela(caminho_arquivo, formato)
+            except Exception:
+                continue
+            if df.shape[1] <= 1:
+                continue
+
+            formato["preco"] = encontrar_coluna(df, ['preço', 'preco', 'price', 'valor'])
+            formato["data"] = encontrar_coluna(df, ['horario', 'data', 'hora', 'time', 'date'])
+            formato["simbolo"] = encontrar_coluna(df, ['id', 'simbolo', 'ativo', 'ticker', 'code'])
+            if formato["preco"] and formato["simbolo"]:
+                return formato
+    return None
+
+def para_numero(serie):
+    """Converte a coluna de preço para float
+
+    Snapshots novos já vêm numéricos e passam direto. Os antigos trazem texto
+    ("R$ 12.34" ou "12,34"): tira símbolos e, se tiver vírgula, trata como formato brasileiro.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+
+    texto = serie.astype(str).str.replace(r"[R$%()\s+]", "", regex=True)
+    brasileiro = texto.str.contains(",", regex=False)
+    texto = texto.where(~brasileiro, texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(texto, errors='coerce')
+
+def ler_arquivo(caminho_arquivo, formato=None):
+    """Roda nos processos filhos: (caminho, formato, (simbolos, precos, datas) ou None, erro)"""
+    try:
+        if formato is None:
+            formato = detectar_formato(caminho_arquivo)
+            if formato is None:
+                return caminho_arquivo, None, None, "colunas não identificadas"
+
+        df = ler_tabela(caminho_arquivo, formato)
+        if formato["tipo"] == "csv":
+            # O legado repete o cabeçalho a cada gravação no mesmo arquivo
+            df = df[df[formato["simbolo"]] != formato["simbolo"]]
+
+        precos = para_numero(df[formato["preco"]]).to_numpy(dtype=np.float64)
+
+        # Sem coluna de horário (ou com valor inválido) vale o horário do nome do arquivo
+        horario = classSnapshots.horario_do_caminho(caminho_arquivo)
+        datas = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+        if formato["data"]:
+            texto = df[formato["data"]].astype(str)
+            # O legado guarda só a hora ("10:30"): o dia vem do nome do arquivo
+            so_hora = texto.str.fullmatch(r"\d{1,2}:\d{2}(:\d{2})?")
+            if horario is not None and so_hora.any():
+                texto = texto.where(~so_hora, f"{horario:%d/%m/%Y} " + texto)
+            datas = pd.to_datetime(texto, dayfirst=not formato["tipo"] == "json", errors='coerce', format="mixed")
+        if horario is not None and datas.isna().any():
+            datas = datas.fillna(horario)
+
+        colunas = (df[formato["simbolo"]].astype(str).to_numpy(), precos, datas.to_numpy(dtype="datetime64[ns]"))
+        return caminho_arquivo, formato, colunas, None
+    except Exception as e:
+        return caminho_arquivo, formato, None, str(e).splitlines()[0]
+
+def assinatura(caminho_arquivo):
+    info = os.stat(caminho_arquivo)
+    return [info.st_size, info.st_mtime_ns]
+
+def carregar_formatos():
+    if not ARQUIVO_FORMATOS.exists():
+        return {}
+    with open(ARQUIVO_FORMATOS, encoding="utf-8") as f:
+        return json.load(f)
+
+def salvar_formatos(formatos):
+    with open(ARQUIVO_FORMATOS, "w", encoding="utf-8") as f:
+        json.dump(formatos, f, indent=4, ensure_ascii=False)
+
+def listar_arquivos(pastas=None):
+    pastas = pastas if pastas is not None else [PASTA_DADOS, PASTA_LEGADO]
+    arquivos = []
+    for pasta in map(Path, pastas):
+        if pasta.exists():
+            arquivos += [str(a) for a in sorted(pasta.rglob("*"))
+                         if a.suffix in (".json", ".csv") and a.name != classSnapshots.MANIFESTO]
+    return arquivos
+
+def carregar_e_limpar_dados(pastas=None, processos=None, desde=None):
+    """Carrega todos os snapshots; com `desde`, só os registros depois desse horário"""
     print("CARREGANDO DADOS")
-    arquivos = glob.glob(os.path.join(PASTA_DADOS, "*.csv"))
+    arquivos = listar_arquivos(pastas)
+
+    if desde is not None:
+        # Pelo nome já dá para pular os arquivos antigos sem abrir nenhum
+        arquivos = [a for a in arquivos
+                    if (horario := classSnapshots.horario_do_caminho(a)) is None or horario > desde]
+        if not arquivos:
+            print("Nenhum snapshot novo desde a última análise.")
+            return None
     
     if not arquivos:
         print(f"Erro: Nenhum arquivo encontrado em '{PASTA_DADOS}'")
         return None
 
-    lista_dfs = []
-    coluna_preco_real = None
-    coluna_data_real = None
-    coluna_simbolo_real = None
-
+    # Formato já conhecido só vale se o arquivo não mudou (mesmo tamanho e data de modificação)
+    formatos = carregar_formatos()
+    conhecidos = []
     for arquivo in arquivos:
-        df_temp = ler_csv_flexivel(arquivo)
-        
-        if df_temp is None:
-            print(f"-> Erro ao ler {os.path.basename(arquivo)} (Arquivo corrompido?)")
-            continue
-
-        if coluna_preco_real is None:
-            coluna_preco_real = encontrar_coluna(df_temp, ['preço', 'preco', 'price', 'valor'])
-            coluna_data_real = encontrar_coluna(df_temp, ['horario', 'data', 'hora', 'time', 'date'])
-            coluna_simbolo_real = encontrar_coluna(df_temp, ['id', 'simbolo', 'ativo', 'ticker', 'code'])
-
-            if not all([coluna_preco_real, coluna_data_real, coluna_simbolo_real]):
-                print(f"-> Ignorando {os.path.basename(arquivo)}: Colunas não identificadas.")
-                print(f"   Colunas encontradas: {list(df_temp.columns)}")
-                coluna_preco_real = None # tentar no próximo
+        item = formatos.get(arquivo)
+        conhecidos.append(item["formato"] if item and item["assinatura"] == assinatura(arquivo) else None)
+
+    partes = []
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        for arquivo, formato, colunas, erro in executor.map(ler_arquivo, arquivos, conhecidos, chunksize=32):
+            if erro is not None:
+                print(f"-> Erro ao ler {os.path.basename(arquivo)}: {erro}")
                 continue
-            else:
-                print(f"   Mapeamento detectado: ID='{coluna_simbolo_real}', Preço='{coluna_preco_real}', Hora='{coluna_data_real}'")
-
-        if coluna_preco_real in df_temp.columns and coluna_data_real in df_temp.columns:
-            df_temp = df_temp.rename(columns={
-                coluna_preco_real: 'preco_limpo',
-                coluna_data_real: 'data_limpa',
-                coluna_simbolo_real: 'simbolo_limpo'
-            })
-            
-            df_temp = df_temp[['simbolo_limpo', 'preco_limpo', 'data_limpa']]
-            lista_dfs.append(df_temp)
-
-    if not lista_dfs:
+            formatos[arquivo] = {"assinatura": assinatura(arquivo), "formato": formato}
+            partes.append(colunas)
+
+    salvar_formatos(formatos)
+
+    if not partes:
         print("Nenhum dado válido foi carregado.")
         return None
 
-    df_geral = pd.concat(lista_dfs, ignore_index=True)
-    df_geral['preco_limpo'] = df_geral['preco_limpo'].astype(str).str.replace('R$', '', regex=False)
-    df_geral['preco_limpo'] = df_geral['preco_limpo'].str.replace('.', '', regex=False) 
-    df_geral['preco_limpo'] = df_geral['preco_limpo'].str.replace(',', '.', regex=False)
-    df_geral['preco_limpo'] = pd.to_numeric(df_geral['preco_limpo'], errors='coerce')
-    df_geral['data_limpa'] = pd.to_datetime(df_geral['data_limpa'], dayfirst=True, errors='coerce')
+    # Aloca as colunas finais uma vez só e copia cada arquivo na sua fatia
+    total = sum(len(precos) for _, precos, _ in partes)
+    simbolos = np.empty(total, dtype=object)
+    precos = np.empty(total, dtype=np.float64)
+    datas = np.empty(total, dtype="datetime64[ns]")
+
+    inicio = 0
+    for s, p, d in partes:
+        fim = inicio + len(p)
+        simbolos[inicio:fim], precos[inicio:fim], datas[inicio:fim] = s, p, d
+        inicio = fim
+
+    df_geral = pd.DataFrame({
+        'simbolo_limpo': pd.Categorical(simbolos),
+        'preco_limpo': precos,
+        'data_limpa': datas,
+    })
     df_geral = df_geral.dropna(subset=['preco_limpo', 'data_limpa'])
-    df_geral = df_geral.sort_values(by=['simbolo_limpo', 'data_limpa'])
+    if desde is not None:
+        df_geral = df_geral[df_geral['data_limpa'] > desde]
+    df_geral = df_geral.sort_values(by=['simbolo_limpo', 'data_limpa'], ignore_index=True)
+    print(f"Total carregado: {len(df_geral)} registros de {len(partes)} arquivos.")
+    return df_geral
+
+def carregar_ticks(desde=None, fim=None, ticks=None):
+    """Mesmo DataFrame do carregar_e_limpar_dados, lido do log binário (classTicks) em vez dos JSON
+
+    Sem parse e sem juntar os dias antes: cada dia é um memmap e os campos vão direto para
+    as colunas finais. Com `desde`, só os registros depois desse horário; sem fim, até hoje.
+    """
+    print("CARREGANDO TICKS")
+    ticks = ticks if ticks is not None else classTicks.Ticks()
+    inicio = desde if desde is not None else ticks.primeiro_dia()
+    fim = fim if fim is not None else pd.Timestamp.now()
+
+    partes = list(ticks.dias(inicio, fim)) if inicio is not None else []
+    total = sum(len(registros) for _, registros in partes)
+    if total == 0:
+        print(f"Erro: Nenhum registro encontrado em '{ticks.pasta}'")
+        return None
+
+    # Aloca as colunas finais uma vez só e copia cada dia na sua fatia
+    ativos = np.empty(total, dtype=np.int32)
+    precos = np.empty(total, dtype=np.float64)
+    datas = np.empty(total, dtype="datetime64[ns]")
+    inicio = 0
+    for _, registros in partes:
+        fim = inicio + len(registros)
+        ativos[inicio:fim] = registros["ativo"]
+        np.divide(registros["preco"], 100, out=precos[inicio:fim])
+        datas.view(np.int64)[inicio:fim] = registros["horario"]
+        inicio = fim
+
+    # Id -> ticker uma vez por ativo, não por registro; id fora da tabela ativos fica NaN
+    nomes = {id_: ticker for ticker, id_ in classBanco.BaDa().ids_ativos().items()}
+    ids, codigos = np.unique(ativos, return_inverse=True)
+    categorias = sorted(nomes[int(i)] for i in ids if int(i) in nomes)
+    posicao = np.array([categorias.index(nomes[int(i)]) if int(i) in nomes else -1 for i in ids], dtype=np.int64)
+    simbolos = pd.Categorical.from_codes(posicao[codigos], categories=categorias)
+
+    df_geral = pd.DataFrame({
+        'simbolo_limpo': simbolos,
+        'preco_limpo': precos,
+        'data_limpa': datas,
+    })
+    df_geral = df_geral.dropna(subset=['simbolo_limpo'])
+    if desde is not None:
+        df_geral = df_geral[df_geral['data_limpa'] > desde]
+    df_geral = df_geral.sort_values(by=['simbolo_limpo', 'data_limpa'], ignore_index=True)
     print(f"Total carregado: {len(df_geral)} registros.")
     return df_geral
 
@@ -115,36 +271,147 @@ def analise_1_sequencial(df):
     df['horario_anterior'] = df.groupby('simbolo_limpo')['data_limpa'].shift(1)
     df['delta_valor'] = df['preco_limpo'] - df['preco_anterior']
     df['delta_tempo'] = df['data_limpa'] - df['horario_anterior']
-    df['tipo_movimento'] = df['delta_valor'].apply(
-        lambda x: 'SUBIU' if x > 0.001 else ('CAIU' if x < -0.001 else 'ESTÁVEL')
-    )
+    df['tipo_movimento'] = classificar_movimento(df['delta_valor'], MOVIMENTOS)
     df_final = df.dropna(subset=['delta_valor'])
     colunas_saida = ['simbolo_limpo', 'data_limpa', 'preco_limpo', 'delta_valor', 'tipo_movimento', 'delta_tempo']
     df_final[colunas_saida].to_csv(ARQUIVO_SAIDA_SEQUENCIAL, index=False)
     print(f"Salvo: {ARQUIVO_SAIDA_SEQUENCIAL}")
 
-def analise_2_horario(df):
-    print("ANÁLISE POR HORÁRIO")
-    
-    df = df.copy() 
-    df['hora'] = df['data_limpa'].dt.hour
-    
-    prev = df.groupby('simbolo_limpo')['preco_limpo'].shift(1)
-    change = df['preco_limpo'] - prev
-    
-    df['direcao'] = change.apply(lambda x: 'Alta' if x > 0.001 else ('Baixa' if x < -0.001 else 'Neutro'))
-    
-    resumo = df.groupby(['hora', 'direcao']).size().unstack(fill_value=0)
-    
+def tabela_horario(contadores):
+    """Contadores {hora: {direcao: n}} -> tabela hora × direção, com o saldo de altas e baixas"""
+    resumo = pd.DataFrame.from_dict(contadores, orient='index').fillna(0).astype(int)
+    resumo.index = resumo.index.astype(int)
+    resumo = resumo.sort_index().rename_axis('hora').rename_axis('direcao', axis=1)
+    resumo = resumo[[d for d in DIRECOES if d in resumo.columns]]
+
     if 'Alta' in resumo.columns and 'Baixa' in resumo.columns:
         resumo['Saldo_Alta_vs_Baixa'] = resumo['Alta'] - resumo['Baixa']
-    
+    return resumo
+
+def analise_2_horario():
+    """Relatório por hora × direção lido da tabela horario_direcao
+
+    A tabela é somada a cada refresh gravado (classBanco.somar_agregados), então aqui não
+    se relê nenhum snapshot: o relatório custa o mesmo com um dia ou anos de histórico.
+    """
+    print("ANÁLISE POR HORÁRIO")
+
+    contadores = classBanco.BaDa().horario_por_direcao()
+    if not contadores:
+        print("Tabela horario_direcao vazia: importe o histórico (importa_snapshots.py) para preenchê-la.")
+        return
+
+    resumo = tabela_horario(contadores)
     print(resumo)
     resumo.to_csv(ARQUIVO_SAIDA_HORARIO)
     print(f"Salvo: {ARQUIVO_SAIDA_HORARIO}")
 
+# ================================= INCREMENTAL =================================
+
+def estado_vazio():
+    # tamanho_sequencial: bytes do CSV sequencial quando o checkpoint foi gravado
+    return {"ultimo_horario": None, "tickers": {}, "tamanho_sequencial": None}
+
+def carregar_estado():
+    if not os.path.exists(ARQUIVO_ESTADO):
+        return estado_vazio()
+    with open(ARQUIVO_ESTADO, encoding="utf-8") as f:
+        return json.load(f)
+
+def salvar_estado(estado):
+    # Grava num temporário e troca: um checkpoint pela metade faria reprocessar ou perder dados
+    temporario = ARQUIVO_ESTADO + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, ARQUIVO_ESTADO)
+
+def atualizar_ultimos(estado, df):
+    """Guarda no estado o último preço/horário de cada ticker de df (já ordenado)"""
+    ultimos = df.groupby('simbolo_limpo', observed=True).tail(1)
+    for simbolo, preco, data in zip(ultimos['simbolo_limpo'], ultimos['preco_limpo'], ultimos['data_limpa']):
+        estado["tickers"][str(simbolo)] = [float(preco), data.isoformat()]
+    estado["ultimo_horario"] = df['data_limpa'].max().isoformat()
+
+def analise_incremental(df_novo, estado):
+    """Processa só os registros novos, continuando de onde o checkpoint parou
+
+    O último preço de cada ticker entra como linha de apoio antes dos dados novos, para o
+    shift(1) dar o mesmo resultado que daria com o histórico inteiro. As linhas novas do
+    sequencial são acrescentadas no CSV; o relatório por horário já vem pronto do banco.
+    """
+    print("ANÁLISE INCREMENTAL")
+
+    apoio = pd.DataFrame(
+        [(simbolo, preco, data) for simbolo, (preco, data) in estado["tickers"].items()],
+        columns=['simbolo_limpo', 'preco_limpo', 'data_limpa'],
+    )
+    apoio['data_limpa'] = pd.to_datetime(apoio['data_limpa'])
+    apoio['apoio'] = True
+
+    df_novo = df_novo.assign(apoio=False)
+    df_novo['simbolo_limpo'] = df_novo['simbolo_limpo'].astype(str)
+
+    df = pd.concat([apoio, df_novo], ignore_index=True)
+    df = df.sort_values(by=['simbolo_limpo', 'data_limpa', 'apoio'], ascending=[True, True, False],
+                        ignore_index=True, kind='stable')
+
+    grupos = df.groupby('simbolo_limpo')
+    df['delta_valor'] = df['preco_limpo'] - grupos['preco_limpo'].shift(1)
+    df['delta_tempo'] = df['data_limpa'] - grupos['data_limpa'].shift(1)
+    df['tipo_movimento'] = classificar_movimento(df['delta_valor'], MOVIMENTOS)
+    novos = df[~df['apoio']]
+
+    # Sequencial: só acrescenta as linhas novas. Antes, corta o que uma rodada que caiu
+    # depois de acrescentar (e antes de gravar o checkpoint) deixou no fim do arquivo
+    sequencial = novos.dropna(subset=['delta_valor'])[COLUNAS_SEQUENCIAL]
+    primeira_vez = not os.path.exists(ARQUIVO_SAIDA_SEQUENCIAL)
+    tamanho = estado.get("tamanho_sequencial")
+    if not primeira_vez and tamanho is not None and os.path.getsize(ARQUIVO_SAIDA_SEQUENCIAL) > tamanho:
+        print(f"Descartando linhas de uma rodada interrompida em {ARQUIVO_SAIDA_SEQUENCIAL}")
+        os.truncate(ARQUIVO_SAIDA_SEQUENCIAL, tamanho)
+    sequencial.to_csv(ARQUIVO_SAIDA_SEQUENCIAL, mode='a', header=primeira_vez, index=False)
+    print(f"Acrescentadas {len(sequencial)} linhas em {ARQUIVO_SAIDA_SEQUENCIAL}")
+
+    analise_2_horario()
+
+    atualizar_ultimos(estado, novos)
+    estado["tamanho_sequencial"] = os.path.getsize(ARQUIVO_SAIDA_SEQUENCIAL)
+    return estado
+
+def analise_completa(processos=None):
+    """Refaz tudo do zero e deixa o checkpoint pronto para as próximas rodadas incrementais"""
+    dados = carregar_e_limpar_dados(processos=processos)
+    if dados is None:
+        return
+
+    analise_1_sequencial(dados.copy())
+    analise_2_horario()
+
+    estado = estado_vazio()
+    atualizar_ultimos(estado, dados)
+    estado["tamanho_sequencial"] = os.path.getsize(ARQUIVO_SAIDA_SEQUENCIAL)
+    salvar_estado(estado)
+
+def analise_do_dia(processos=None):
+    """Roda a análise só com o que chegou depois do checkpoint (ou completa, na primeira vez)"""
+    estado = carregar_estado()
+    if estado["ultimo_horario"] is None or not os.path.exists(ARQUIVO_SAIDA_SEQUENCIAL):
+        analise_completa(processos)
+        return
+
+    dados = carregar_e_limpar_dados(processos=processos, desde=pd.Timestamp(estado["ultimo_horario"]))
+    if dados is None or dados.empty:
+        return
+
+    salvar_estado(analise_incremental(dados, estado))
+
 if __name__ == "__main__":
-    dados = carregar_e_limpar_dados()
-    if dados is not None:
-        analise_1_sequencial(dados)
-        analise_2_horario(dados)
+    parser = argparse.ArgumentParser(description="Análise de padrões dos snapshots")
+    parser.add_argument("--completo", action="store_true", help="ignora o checkpoint e refaz tudo")
+    parser.add_argument("--processos", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.completo:
+        analise_completa(args.processos)
+    else:
+        analise_do_dia(args.processos)
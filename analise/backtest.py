@@ -0,0 +1,257 @@
+# Backtest de regras de compra e venda sobre o histórico de snapshots
+#
+# Cada regra vira uma matriz de posição (1 comprado, 0 fora) para todos os tickers de uma
+# vez, calculada com os indicadores; a posição decidida numa cotação vale a partir da
+# seguinte. A grade de parâmetros é dividida entre processos: a matriz de preços fica numa
+# memória compartilhada (multiprocessing.shared_memory), então cada processo só lê, sem
+# receber uma cópia por tarefa.
+#
+# Resultado por regra/parâmetros/ticker: retorno, retorno do ativo parado (buy and hold),
+# drawdown máximo, número de operações, taxa de acerto e exposição.
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+import indicadores
+
+ARQUIVO_RESULTADOS = "backtest_resultados.csv"
+CUSTO = 0.0005 # Corretagem + emolumentos por lado, em fração do valor
+
+# Parâmetros testados de cada regra (todas as combinações)
+GRADES = {
+    'cruzamento_medias': {'rapida': [5, 8, 9, 12, 15, 20], 'lenta': [21, 26, 30, 40, 50, 100, 200]},
+    'rsi': {'n': [7, 9, 14, 21], 'compra': [20, 25, 30, 35], 'venda': [55, 60, 65, 70, 75]},
+    'rompimento': {'entrada': [10, 20, 40, 55], 'saida': [5, 10, 20]},
+    'bollinger': {'n': [10, 20, 30, 50], 'k': [1.5, 2.0, 2.5, 3.0]},
+}
+
+# Funções dos indicadores sem a compactação: a matriz do backtest já vem compactada
+_ema = indicadores.ema.__wrapped__
+_rsi = indicadores.rsi.__wrapped__
+_bollinger = indicadores.bollinger.__wrapped__
+
+
+# ================================= REGRAS =================================
+
+def manter(entrada, saida):
+    """Posição que liga na entrada e só desliga na saída (no mesmo passo, a saída vence)
+
+    Preenche para frente o último evento de cada linha: sem laço no tempo.
+    """
+    evento = np.where(saida, 0, np.where(entrada, 1, -1)).astype(np.int8)
+    colunas = np.where(evento >= 0, np.arange(evento.shape[1]), 0)
+    np.maximum.accumulate(colunas, axis=1, out=colunas)
+    posicao = np.take_along_axis(evento, colunas, axis=1)
+    return posicao > 0
+
+def regra_cruzamento_medias(precos, rapida, lenta):
+    """Comprado enquanto a EMA rápida está acima da lenta"""
+    if rapida >= lenta:
+        return None
+    return _ema(precos, rapida) > _ema(precos, lenta)
+
+def regra_rsi(precos, n, compra, venda):
+    """Compra quando o RSI cai abaixo de `compra`, vende quando passa de `venda`"""
+    rsi = _rsi(precos, n)
+    return manter(rsi < compra, rsi > venda)
+
+def regra_rompimento(precos, entrada, saida):
+    """Canal de Donchian: compra acima da máxima de `entrada` cotações, vende abaixo da mínima de `saida`"""
+    anteriores = np.full(precos.shape, np.nan)
+    anteriores[:, 1:] = precos[:, :-1]
+    # Máxima/mínima móvel do pandas (O(1) por célula), com o tempo nas linhas
+    maxima = pd.DataFrame(anteriores.T).rolling(entrada).max().to_numpy().T
+    minima = pd.DataFrame(anteriores.T).rolling(saida).min().to_numpy().T
+    return manter(precos > maxima, precos < minima)
+
+def regra_bollinger(precos, n, k):
+    """Compra abaixo da banda inferior e vende quando volta à média"""
+    media, _, inferior = _bollinger(precos, n, k)
+    return manter(precos < inferior, precos > media)
+
+REGRAS = {
+    'cruzamento_medias': regra_cruzamento_medias,
+    'rsi': regra_rsi,
+    'rompimento': regra_rompimento,
+    'bollinger': regra_bollinger,
+}
+
+def combinacoes(grades=GRADES):
+    """[(regra, {parametro: valor})] de todas as combinações da grade"""
+    tarefas = []
+    for regra, grade in grades.items():
+        for valores in itertools.product(*grade.values()):
+            tarefas.append((regra, dict(zip(grade.keys(), valores))))
+    return tarefas
+
+
+# ================================= MÉTRICAS =================================
+
+def log_variacoes(precos):
+    """log(p[t] / p[t-1]) de cada cotação (0 na primeira e nas colunas sem preço)
+
+    Não depende da regra: cada processo calcula uma vez e usa em todas as combinações.
+    """
+    variacao = np.zeros(precos.shape)
+    with np.errstate(invalid="ignore"):
+        variacao[:, 1:] = np.nan_to_num(np.log(precos[:, 1:] / precos[:, :-1]))
+    return variacao
+
+def avaliar(precos, posicao, custo=CUSTO, variacoes=None):
+    """Métricas por ticker de uma matriz de posição: {metrica: array N}
+
+    precos vem compactado (NaN só no fim de cada linha). A posição de uma coluna vale
+    para a variação da coluna seguinte; cada troca de posição multiplica o patrimônio por
+    (1 - custo). A última cotação válida de cada linha fecha o que estiver aberto. Tudo em
+    log: o patrimônio é uma soma acumulada e o drawdown sai sem exponenciar a matriz.
+    """
+    n_tickers, n_horarios = precos.shape
+    variacoes = log_variacoes(precos) if variacoes is None else variacoes
+    validos = ~np.isnan(precos)
+    n_validos = validos.sum(axis=1)
+    ultima = np.maximum(n_validos - 1, 0)
+
+    posicao = posicao & validos
+    posicao[:, 0] = False
+    posicao[np.arange(n_tickers), ultima] = False
+
+    diferenca = np.diff(posicao.view(np.int8), axis=1)
+    log_patrimonio = np.zeros(precos.shape)
+    log_patrimonio[:, 1:] = np.where(posicao[:, :-1], variacoes[:, 1:], 0.0)
+    log_patrimonio[:, 1:] += np.log1p(-custo) * (diferenca != 0)
+    np.cumsum(log_patrimonio, axis=1, out=log_patrimonio)
+
+    # Drawdown em log: distância até o maior patrimônio já visto (começando em 1, log 0)
+    pico = np.maximum.accumulate(np.maximum(log_patrimonio, 0.0), axis=1)
+    drawdown = np.expm1((log_patrimonio - pico).min(axis=1))
+
+    # Operações: da coluna em que a posição liga até a que desliga (sempre pareadas,
+    # porque a primeira e a última cotação de cada linha estão zeradas)
+    linhas_entrada, colunas_entrada = np.nonzero(diferenca > 0)
+    _, colunas_saida = np.nonzero(diferenca < 0)
+    resultado_operacao = (log_patrimonio[linhas_entrada, colunas_saida + 1]
+                          - log_patrimonio[linhas_entrada, colunas_entrada])
+    operacoes = np.bincount(linhas_entrada, minlength=n_tickers)
+    acertos = np.bincount(linhas_entrada, weights=resultado_operacao > 0, minlength=n_tickers)
+
+    primeiro = precos[:, 0]
+    ultimo = precos[np.arange(n_tickers), ultima]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            'retorno': np.expm1(log_patrimonio[:, -1]),
+            'retorno_ativo': ultimo / primeiro - 1.0,
+            'drawdown_maximo': drawdown,
+            'operacoes': operacoes,
+            'taxa_acerto': np.where(operacoes > 0, acertos / operacoes, np.nan),
+            'exposicao': posicao.sum(axis=1) / np.maximum(n_validos, 1),
+        }
+
+
+# ================================= PROCESSOS =================================
+
+_MEMORIA = None
+_PRECOS = None
+_VARIACOES = None
+
+def _iniciar_processo(nome, forma):
+    """Liga o processo à matriz de preços da memória compartilhada (sem copiar)"""
+    global _MEMORIA, _PRECOS, _VARIACOES
+    _MEMORIA = shared_memory.SharedMemory(name=nome)
+    _PRECOS = np.ndarray(forma, dtype=np.float64, buffer=_MEMORIA.buf)
+    _PRECOS.flags.writeable = False
+    _VARIACOES = log_variacoes(_PRECOS)
+
+def _rodar_lote(lote):
+    """Roda nos processos filhos: [(regra, parametros, metricas ou None)]"""
+    saida = []
+    for regra, parametros, custo in lote:
+        posicao = REGRAS[regra](_PRECOS, **parametros)
+        saida.append((regra, parametros, None if posicao is None else avaliar(_PRECOS, posicao, custo, _VARIACOES)))
+    return saida
+
+def rodar(matriz, tickers, tarefas=None, processos=None, custo=CUSTO, lote=4):
+    """Roda as regras da grade em paralelo e devolve um DataFrame (uma linha por regra/parâmetros/ticker)"""
+    tarefas = tarefas if tarefas is not None else combinacoes()
+    compacta, _ = indicadores.compactar(np.asarray(matriz, dtype=np.float64))
+    processos = processos or os.cpu_count()
+
+    memoria = shared_memory.SharedMemory(create=True, size=max(compacta.nbytes, 1))
+    try:
+        np.ndarray(compacta.shape, dtype=np.float64, buffer=memoria.buf)[:] = compacta
+        del compacta
+
+        lotes = [[(regra, parametros, custo) for regra, parametros in tarefas[i:i + lote]]
+                 for i in range(0, len(tarefas), lote)]
+        partes = []
+        feitas = 0
+        aviso = max(len(tarefas) // 10, 1)
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo,
+                                 initargs=(memoria.name, np.shape(matriz))) as executor:
+            for resultados in executor.map(_rodar_lote, lotes):
+                for regra, parametros, metricas in resultados:
+                    feitas += 1
+                    if feitas % aviso == 0:
+                        print(f"{feitas}/{len(tarefas)} combinações")
+                    if metricas is None:
+                        continue
+                    parte = pd.DataFrame(metricas)
+                    parte.insert(0, 'ativo', tickers)
+                    parte.insert(0, 'parametros', " ".join(f"{k}={v}" for k, v in parametros.items()))
+                    parte.insert(0, 'regra', regra)
+                    partes.append(parte)
+    finally:
+        memoria.close()
+        memoria.unlink()
+
+    if not partes:
+        return pd.DataFrame()
+    return pd.concat(partes, ignore_index=True)
+
+def resumo_por_regra(resultados):
+    """Uma linha por regra/parâmetros: mediana dos retornos entre os tickers, drawdown e acerto"""
+    resultados = resultados.assign(
+        ganha_do_ativo=resultados['retorno'] > resultados['retorno_ativo'],
+        acertos=resultados['taxa_acerto'].fillna(0) * resultados['operacoes'],
+    )
+    resumo = resultados.groupby(['regra', 'parametros'], sort=False).agg(
+        retorno_mediano=('retorno', 'median'),
+        retorno_medio=('retorno', 'mean'),
+        ganha_do_ativo=('ganha_do_ativo', 'mean'),
+        drawdown_medio=('drawdown_maximo', 'mean'),
+        operacoes=('operacoes', 'sum'),
+        acertos=('acertos', 'sum'),
+    )
+    resumo['taxa_acerto'] = resumo.pop('acertos') / resumo['operacoes'].where(resumo['operacoes'] > 0)
+    return resumo.sort_values('retorno_mediano', ascending=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest das regras de compra e venda sobre os snapshots")
+    parser.add_argument("--frequencia", default="15min", help="barras usadas no teste (ex.: 5min, 15min, 1h)")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--custo", type=float, default=CUSTO, help="custo por lado, em fração")
+    parser.add_argument("--ticks", action="store_true", help="lê o log binário em vez dos JSON")
+    args = parser.parse_args()
+
+    carregado = indicadores.carregar_matriz(args.frequencia, processos=args.processos, ticks=args.ticks)
+    if carregado is not None:
+        tickers, horarios, matrizes = carregado
+        tarefas = combinacoes()
+        print(f"{len(tickers)} tickers × {len(horarios)} horários, {len(tarefas)} combinações")
+
+        inicio = time.perf_counter()
+        resultados = rodar(matrizes['fechamento'], tickers, tarefas, args.processos, args.custo)
+        print(f"Tempo {time.perf_counter() - inicio:.2f}")
+
+        resultados.to_csv(ARQUIVO_RESULTADOS, index=False)
+        print(f"Salvo: {ARQUIVO_RESULTADOS}")
+        print(resumo_por_regra(resultados).head(20).round(4).to_string())
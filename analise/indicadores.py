@@ -0,0 +1,278 @@
+# Indicadores técnicos (SMA, EMA, RSI, MACD, Bollinger, ATR) de todos os tickers de uma vez
+#
+# Tudo trabalha numa matriz tickers × horários (uma linha por ticker, uma coluna por refresh).
+# Quem não veio num refresh fica com NaN naquela coluna: antes de calcular, os valores de cada
+# linha são "compactados" para o começo (os NaN vão para o fim), então as janelas contam só
+# cotações de verdade, e no fim cada resultado volta para a coluna de onde veio. Nas colunas
+# em que o ticker não tem cotação o indicador sai NaN.
+
+import argparse
+import functools
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+
+# ================================= MATRIZ =================================
+
+def montar_matriz(df, coluna_ativo='simbolo_limpo', coluna_horario='data_limpa', coluna_valor='preco_limpo'):
+    """DataFrame longo (um registro por ticker/horário) -> (tickers, horarios, matriz N × T)
+
+    Se o mesmo ticker aparecer duas vezes no mesmo horário, fica o último.
+    """
+    codigos_ativo, tickers = pd.factorize(df[coluna_ativo], sort=True)
+    codigos_horario, horarios = pd.factorize(df[coluna_horario], sort=True)
+
+    matriz = np.full((len(tickers), len(horarios)), np.nan)
+    matriz[codigos_ativo, codigos_horario] = df[coluna_valor].to_numpy(dtype=np.float64)
+    return pd.Index(np.asarray(tickers), name=coluna_ativo), pd.Index(horarios, name=coluna_horario), matriz
+
+def montar_barras(df, frequencia="1h", coluna_ativo='simbolo_limpo', coluna_horario='data_limpa',
+                  coluna_valor='preco_limpo'):
+    """Agrupa as cotações em barras (abertura, maxima, minima, fechamento) por ticker
+
+    Devolve (tickers, horarios, {campo: matriz N × T}); o horário é o início da barra.
+    """
+    barras = (df.assign(barra=df[coluna_horario].dt.floor(frequencia))
+                .sort_values(coluna_horario, kind='stable')
+                .groupby([coluna_ativo, 'barra'], observed=True)[coluna_valor]
+                .agg(abertura='first', maxima='max', minima='min', fechamento='last')
+                .reset_index())
+
+    tickers, horarios, fechamento = montar_matriz(barras, coluna_ativo, 'barra', 'fechamento')
+    linhas = tickers.get_indexer(barras[coluna_ativo])
+    colunas = horarios.get_indexer(barras['barra'])
+
+    matrizes = {'fechamento': fechamento}
+    for campo in ('abertura', 'maxima', 'minima'):
+        matriz = np.full(fechamento.shape, np.nan)
+        matriz[linhas, colunas] = barras[campo].to_numpy(dtype=np.float64)
+        matrizes[campo] = matriz
+    return tickers, horarios, matrizes
+
+def carregar_matriz(frequencia=None, pastas=None, processos=None, desde=None, ticks=False):
+    """Matriz de preços a partir dos snapshots guardados (usa o carregador da analise_padroes)
+
+    Sem frequência, uma coluna por refresh; com frequência ("15min", "1h", "1D"...), barras.
+    Com ticks=True lê o log binário (classTicks) em vez dos JSON, bem mais rápido.
+    """
+    # Só aqui: quem usa só as funções de cálculo (varredura, ao vivo) não precisa do carregador
+    import analise_padroes
+
+    if ticks:
+        dados = analise_padroes.carregar_ticks(desde)
+    else:
+        dados = analise_padroes.carregar_e_limpar_dados(pastas, processos, desde)
+    if dados is None:
+        return None
+    if frequencia is None:
+        tickers, horarios, matriz = montar_matriz(dados)
+        return tickers, horarios, {'fechamento': matriz}
+    return montar_barras(dados, frequencia)
+
+
+# ================================= LACUNAS =================================
+
+def compactar(matriz):
+    """Leva os valores válidos de cada linha para o começo, na mesma ordem
+
+    Devolve (compacta, posicoes): posicoes[i, j] é a coluna da compacta onde foi parar
+    matriz[i, j]. Sem ordenação: a posição sai de contagens acumuladas, O(N × T).
+    """
+    validos = ~np.isnan(matriz)
+    acumulados = np.cumsum(validos, axis=1, dtype=np.int32)
+    colunas = np.arange(matriz.shape[1], dtype=np.int32)
+    # Válido: quantos válidos vieram antes; NaN: depois de todos os válidos da linha
+    posicoes = np.where(validos, acumulados - 1, acumulados[:, -1:] + colunas - acumulados)
+
+    compacta = np.empty(matriz.shape)
+    compacta.ravel()[(posicoes + _inicio_das_linhas(matriz)).ravel()] = matriz.ravel()
+    return compacta, posicoes
+
+def expandir(compacta, posicoes):
+    """Volta cada valor calculado na compacta para a coluna original"""
+    return compacta.ravel()[posicoes + _inicio_das_linhas(compacta)]
+
+def _inicio_das_linhas(matriz):
+    # Índice plano da primeira coluna de cada linha, para indexar com ravel()
+    return np.arange(0, matriz.size, max(matriz.shape[1], 1), dtype=np.int64)[:, None]
+
+def sem_lacunas(funcao):
+    """Faz uma função que espera linhas sem buracos aceitar a matriz com NaN
+
+    Os NaN só sobram no fim de cada linha compactada e se propagam nos cálculos, então o
+    resultado volta como NaN nas colunas sem cotação. Matrizes extras (máxima, mínima) são
+    compactadas com as posições da primeira, para continuarem alinhadas. Quem já tem a
+    matriz compactada chama a função original por __wrapped__.
+    """
+    @functools.wraps(funcao)
+    def calcular(matriz, *args, **kwargs):
+        compacta, posicoes = compactar(np.asarray(matriz, dtype=np.float64))
+        for nome, valor in kwargs.items():
+            if isinstance(valor, np.ndarray):
+                kwargs[nome] = np.empty(compacta.shape)
+                kwargs[nome].ravel()[(posicoes + _inicio_das_linhas(compacta)).ravel()] = valor.ravel()
+
+        resultado = funcao(compacta, *args, **kwargs)
+        if isinstance(resultado, tuple):
+            return tuple(expandir(r, posicoes) for r in resultado)
+        return expandir(resultado, posicoes)
+
+    return calcular
+
+
+# ================================= BASES =================================
+# As funções com _ trabalham na matriz já compactada (NaN só no fim de cada linha)
+
+def _soma_movel(x, n):
+    """Soma das últimas n colunas (NaN nas n - 1 primeiras)"""
+    acumulada = np.zeros((x.shape[0], x.shape[1] + 1))
+    np.cumsum(x, axis=1, out=acumulada[:, 1:])
+
+    soma = np.full(x.shape, np.nan)
+    soma[:, n - 1:] = acumulada[:, n:] - acumulada[:, :-n]
+    return soma
+
+def _media_exponencial(x, alfa, minimo=1):
+    """EMA com alfa fixo, como pandas ewm(adjust=False, min_periods=minimo)
+
+    Começa na primeira coluna, então cada linha precisa começar num valor válido (NaN só
+    no fim). O laço é no tempo; cada passo atualiza todos os tickers de uma vez, com as
+    operações gravando direto na saída.
+    """
+    colunas = np.ascontiguousarray(x.T)
+    saida = np.empty_like(colunas)
+    if len(colunas) == 0:
+        return saida.T
+
+    saida[0] = colunas[0]
+    for t in range(1, len(colunas)):
+        # saida[t] = saida[t-1] + alfa * (x[t] - saida[t-1])
+        np.subtract(colunas[t], saida[t - 1], out=saida[t])
+        saida[t] *= alfa
+        saida[t] += saida[t - 1]
+
+    saida = saida.T
+    if minimo > 1:
+        saida[:, :minimo - 1] = np.nan
+    return saida
+
+def _media_exponencial_atrasada(x, alfa, minimo=1):
+    """_media_exponencial de uma série com NaN no começo (ex.: a linha do MACD aquecendo)
+
+    Compacta de novo, para cada linha começar no primeiro valor válido, e devolve no lugar.
+    """
+    compacta, posicoes = compactar(x)
+    return expandir(_media_exponencial(compacta, alfa, minimo), posicoes)
+
+
+# ================================= INDICADORES =================================
+
+@sem_lacunas
+def sma(x, n=20):
+    """Média simples das últimas n cotações"""
+    return _soma_movel(x, n) / n
+
+@sem_lacunas
+def ema(x, span=20):
+    """Média exponencial com alfa = 2 / (span + 1), a partir da span-ésima cotação"""
+    return _media_exponencial(x, 2.0 / (span + 1), minimo=span)
+
+@sem_lacunas
+def rsi(x, n=14):
+    """RSI de Wilder (médias de ganhos e perdas com alfa = 1 / n), de 0 a 100"""
+    # A primeira cotação não tem variação: as médias começam na segunda coluna
+    diferenca = np.diff(x, axis=1)
+    ganho = _media_exponencial(np.maximum(diferenca, 0.0), 1.0 / n, minimo=n)
+    perda = _media_exponencial(np.maximum(-diferenca, 0.0), 1.0 / n, minimo=n)
+
+    resultado = np.full(x.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resultado[:, 1:] = np.where(perda == 0, np.where(ganho == 0, 50.0, 100.0),
+                                    100.0 - 100.0 / (1.0 + ganho / perda))
+    return resultado
+
+@sem_lacunas
+def macd(x, rapida=12, lenta=26, sinal=9):
+    """(linha, sinal, histograma): EMA rápida - EMA lenta e a EMA da própria linha"""
+    linha = (_media_exponencial(x, 2.0 / (rapida + 1), minimo=lenta)
+             - _media_exponencial(x, 2.0 / (lenta + 1), minimo=lenta))
+    linha_sinal = _media_exponencial_atrasada(linha, 2.0 / (sinal + 1), minimo=sinal)
+    return linha, linha_sinal, linha - linha_sinal
+
+@sem_lacunas
+def bollinger(x, n=20, k=2.0):
+    """(media, superior, inferior): SMA de n ± k desvios padrão (populacional) da janela"""
+    # Centraliza cada linha no seu primeiro valor: a soma dos quadrados fica pequena e a
+    # subtração E[x²] - E[x]² não perde precisão em séries longas
+    centro = x[:, :1]
+    desvio_centro = x - centro
+    media = _soma_movel(desvio_centro, n) / n
+    variancia = np.maximum(_soma_movel(desvio_centro ** 2, n) / n - media ** 2, 0.0)
+    desvio = np.sqrt(variancia)
+
+    media = media + centro
+    return media, media + k * desvio, media - k * desvio
+
+@sem_lacunas
+def atr(fechamento, n=14, maxima=None, minima=None):
+    """ATR de Wilder; sem máxima/mínima (refreshes soltos), o true range é |Δ fechamento|"""
+    maxima = fechamento if maxima is None else maxima
+    minima = fechamento if minima is None else minima
+
+    anterior = np.full(fechamento.shape, np.nan)
+    anterior[:, 1:] = fechamento[:, :-1]
+    amplitude = maxima - minima
+
+    # Na primeira barra não há fechamento anterior: vale só a amplitude
+    true_range = np.where(np.isnan(anterior), amplitude,
+                          np.fmax(amplitude, np.fmax(np.abs(maxima - anterior), np.abs(minima - anterior))))
+    return _media_exponencial(true_range, 1.0 / n, minimo=n)
+
+
+# ================================= TABELA =================================
+
+def calcular_todos(matrizes):
+    """Todos os indicadores com os parâmetros de costume: {nome: matriz N × T}
+
+    matrizes: {'fechamento': ...} e, se vierem de barras, 'maxima' e 'minima'.
+    """
+    fechamento = matrizes['fechamento']
+    resultado = {
+        'sma_20': sma(fechamento, 20),
+        'ema_9': ema(fechamento, 9),
+        'ema_21': ema(fechamento, 21),
+        'rsi_14': rsi(fechamento, 14),
+    }
+    resultado['macd'], resultado['macd_sinal'], resultado['macd_hist'] = macd(fechamento)
+    resultado['bb_media'], resultado['bb_superior'], resultado['bb_inferior'] = bollinger(fechamento)
+    resultado['atr_14'] = atr(fechamento, 14, maxima=matrizes.get('maxima'), minima=matrizes.get('minima'))
+    return resultado
+
+def ultimos_valores(tickers, fechamento, indicadores):
+    """DataFrame com o último preço de cada ticker e os indicadores nessa mesma coluna"""
+    validos = ~np.isnan(fechamento)
+    ultima = fechamento.shape[1] - 1 - np.argmax(validos[:, ::-1], axis=1)
+    linhas = np.arange(len(tickers))
+
+    colunas = {'preco': fechamento[linhas, ultima]}
+    colunas.update({nome: matriz[linhas, ultima] for nome, matriz in indicadores.items()})
+    return pd.DataFrame(colunas, index=tickers)[validos.any(axis=1)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indicadores técnicos de todos os tickers a partir dos snapshots")
+    parser.add_argument("--frequencia", default=None, help="agrupa em barras (ex.: 15min, 1h, 1D); padrão: cada refresh")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--ticks", action="store_true", help="lê o log binário em vez dos JSON")
+    args = parser.parse_args()
+
+    carregado = carregar_matriz(args.frequencia, processos=args.processos, ticks=args.ticks)
+    if carregado is not None:
+        tickers, horarios, matrizes = carregado
+        print(f"{len(tickers)} tickers × {len(horarios)} horários")
+        tabela = ultimos_valores(tickers, matrizes['fechamento'], calcular_todos(matrizes))
+        print(tabela.round(2).to_string())
@@ -0,0 +1,189 @@
+# Varredura de padrões de preço em todos os tickers de uma vez
+#
+# Procura, numa matriz tickers × horários, os padrões que interessam para compra e venda:
+#   sequencia_alta / sequencia_baixa:   n variações seguidas para o mesmo lado
+#   reversao_alta / reversao_baixa:     n variações para um lado e a seguinte para o outro
+#   rompimento_alta / rompimento_baixa: preço acima da máxima (abaixo da mínima) das últimas cotações
+#   gap_alta / gap_baixa:               salto entre duas cotações seguidas acima do limiar
+# As janelas são views (sliding_window_view): nenhuma cópia e nenhum laço por ticker ou horário.
+# O resultado é uma tabela só com os sinais encontrados (Ativo, Horario, Padrao, Valor).
+
+import threading
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import indicadores
+
+PADROES = ['sequencia_alta', 'sequencia_baixa', 'reversao_alta', 'reversao_baixa',
+           'rompimento_alta', 'rompimento_baixa', 'gap_alta', 'gap_baixa']
+
+SEQUENCIA = 3             # Variações seguidas para contar como sequência
+JANELA_ROMPIMENTO = 20    # Cotações anteriores que definem máxima/mínima
+LIMIAR_GAP = 0.02         # Salto de 2% entre duas cotações
+ZONA_NEUTRA = 0.0005      # Variação menor que 0,05% não conta nem como alta nem como queda
+
+
+def detectar(precos, sequencia=SEQUENCIA, janela_rompimento=JANELA_ROMPIMENTO,
+             limiar_gap=LIMIAR_GAP, zona_neutra=ZONA_NEUTRA):
+    """Máscaras e valores de cada padrão: {padrao: (mascara N × T, valor N × T)}
+
+    precos não pode ter buraco no meio da linha (NaN só no começo ou no fim): use
+    varrer() para uma matriz com lacunas. O sinal fica na coluna em que o padrão se completa.
+    Valor: retorno acumulado (sequência), retorno da virada (reversão), distância até a
+    máxima/mínima rompida (rompimento) e o tamanho do salto (gap), todos em fração.
+    """
+    n_tickers, n_horarios = precos.shape
+    resultado = {}
+
+    def completar(mascara, valor, inicio):
+        # As janelas só existem a partir de `inicio`: antes disso, sem sinal
+        cheia = np.zeros((n_tickers, n_horarios), dtype=bool)
+        valores = np.full((n_tickers, n_horarios), np.nan)
+        cheia[:, inicio:] = mascara
+        valores[:, inicio:] = valor
+        return cheia, np.where(cheia, valores, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        retorno = precos[:, 1:] / precos[:, :-1] - 1.0
+    direcao = np.select([retorno > zona_neutra, retorno < -zona_neutra], [1, -1], 0).astype(np.int8)
+
+    if n_horarios > sequencia:
+        # Janela de `sequencia` direções: todas +1 ou todas -1
+        janelas = sliding_window_view(direcao, sequencia, axis=1)
+        soma = janelas.sum(axis=2, dtype=np.int16)
+        acumulado = precos[:, sequencia:] / precos[:, :-sequencia] - 1.0
+        resultado['sequencia_alta'] = completar(soma == sequencia, acumulado, sequencia)
+        resultado['sequencia_baixa'] = completar(soma == -sequencia, acumulado, sequencia)
+
+    if n_horarios > sequencia + 1:
+        # Janela de `sequencia` + 1 direções: as primeiras iguais e a última ao contrário
+        janelas = sliding_window_view(direcao, sequencia + 1, axis=1)
+        antes = janelas[:, :, :-1].sum(axis=2, dtype=np.int16)
+        virada = janelas[:, :, -1]
+        ultimo = retorno[:, sequencia:]
+        resultado['reversao_alta'] = completar((antes == -sequencia) & (virada == 1), ultimo, sequencia + 1)
+        resultado['reversao_baixa'] = completar((antes == sequencia) & (virada == -1), ultimo, sequencia + 1)
+
+    if n_horarios > janela_rompimento:
+        # Máxima e mínima das `janela_rompimento` cotações antes de cada uma
+        anteriores = sliding_window_view(precos[:, :-1], janela_rompimento, axis=1)
+        maxima = anteriores.max(axis=2)
+        minima = anteriores.min(axis=2)
+        atual = precos[:, janela_rompimento:]
+        resultado['rompimento_alta'] = completar(atual > maxima, atual / maxima - 1.0, janela_rompimento)
+        resultado['rompimento_baixa'] = completar(atual < minima, atual / minima - 1.0, janela_rompimento)
+
+    if n_horarios > 1:
+        resultado['gap_alta'] = completar(retorno >= limiar_gap, retorno, 1)
+        resultado['gap_baixa'] = completar(retorno <= -limiar_gap, retorno, 1)
+
+    return resultado
+
+def tabela_de_sinais(resultado, tickers, horarios):
+    """Só os sinais encontrados: Ativo, Horario, Padrao, Valor (ordenado por horário)
+
+    horarios pode ser um horário por coluna (T) ou um por célula (N × T).
+    """
+    tickers = np.asarray(tickers)
+    horarios = np.asarray(horarios)
+    partes = []
+
+    for padrao, (mascara, valor) in resultado.items():
+        linhas, colunas = np.nonzero(mascara)
+        partes.append(pd.DataFrame({
+            'Ativo': tickers[linhas],
+            'Horario': horarios[linhas, colunas] if horarios.ndim == 2 else horarios[colunas],
+            'Padrao': padrao,
+            'Valor': valor[linhas, colunas],
+        }))
+
+    if not partes:
+        return pd.DataFrame(columns=['Ativo', 'Horario', 'Padrao', 'Valor'])
+
+    sinais = pd.concat(partes, ignore_index=True)
+    sinais['Padrao'] = pd.Categorical(sinais['Padrao'], categories=PADROES)
+    return sinais.sort_values(['Horario', 'Ativo', 'Padrao'], ignore_index=True)
+
+def varrer(matriz, tickers, horarios, **parametros):
+    """Varre a matriz tickers × horários (com NaN de quem pulou refresh) e devolve a tabela
+
+    Os valores de cada linha são compactados antes (as janelas contam só cotações de
+    verdade) e cada sinal volta para a coluna da cotação que completou o padrão.
+    """
+    compacta, posicoes = indicadores.compactar(np.asarray(matriz, dtype=np.float64))
+    resultado = detectar(compacta, **parametros)
+
+    # Leva cada máscara de volta para as colunas originais; nas lacunas não há sinal
+    lacunas = np.isnan(matriz)
+    for padrao, (mascara, valor) in resultado.items():
+        mascara = indicadores.expandir(mascara, posicoes) & ~lacunas
+        resultado[padrao] = mascara, indicadores.expandir(valor, posicoes)
+    return tabela_de_sinais(resultado, tickers, horarios)
+
+
+class JanelaRecente:
+    """Últimas cotações de cada ticker, para varrer o universo inteiro a cada refresh
+
+    Um array (capacidade × tamanho) indexado pelo id da tabela ativos, com a cotação mais
+    nova na última coluna. Cada ticker só anda quando chega cotação dele, então a linha
+    nunca tem buraco no meio e dá para varrer direto, sem compactar.
+    """
+
+    def __init__(self, tamanho=64, capacidade=256):
+        self.tamanho = tamanho
+        self.trava = threading.Lock()
+        self.precos = np.full((capacidade, tamanho), np.nan)
+        self.horarios = np.full((capacidade, tamanho), np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    def crescer(self, capacidade):
+        extra = capacidade - len(self.precos)
+        self.precos = np.vstack([self.precos, np.full((extra, self.tamanho), np.nan)])
+        self.horarios = np.vstack([self.horarios, np.full((extra, self.tamanho), np.datetime64("NaT"),
+                                                          dtype="datetime64[ns]")])
+
+    def atualizar(self, ids, precos, horario):
+        """Empurra uma cotação nova para cada id (ids repetidos: vale a última)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        precos = np.asarray(precos, dtype=np.float64)
+        validos = ~np.isnan(precos)
+        ids, precos = ids[validos], precos[validos]
+        if len(ids) == 0:
+            return
+
+        ids, ultima = np.unique(ids[::-1], return_index=True)
+        precos = precos[::-1][ultima]
+
+        with self.trava:
+            if ids.max() >= len(self.precos):
+                self.crescer(max(int(ids.max()) + 1, len(self.precos) * 2))
+
+            self.precos[ids, :-1] = self.precos[ids, 1:]
+            self.precos[ids, -1] = precos
+            self.horarios[ids, :-1] = self.horarios[ids, 1:]
+            self.horarios[ids, -1] = np.datetime64(pd.Timestamp(horario).to_datetime64(), "ns")
+
+    def atualizar_resumo(self, df_resumo, ids_ativos, horario):
+        """Atualiza a partir do resumo numérico de um refresh; ids_ativos: {ticker: id}"""
+        ids = df_resumo["Ativo"].map(ids_ativos)
+        conhecidos = ids.notna().to_numpy()
+        self.atualizar(ids[conhecidos].to_numpy(dtype=np.int64),
+                       df_resumo["Preço"].to_numpy(dtype=np.float64)[conhecidos], horario)
+
+    def varrer(self, nomes=None, **parametros):
+        """Sinais na cotação mais recente de cada ticker; nomes: {id: ticker} para a coluna Ativo"""
+        # Só as colunas que algum padrão alcança a partir da última
+        colunas = max(parametros.get('sequencia', SEQUENCIA) + 2,
+                      parametros.get('janela_rompimento', JANELA_ROMPIMENTO) + 1)
+        with self.trava:
+            ativos = np.flatnonzero(~np.isnan(self.precos[:, -1]))
+            precos = self.precos[ativos, -colunas:]
+            horarios = self.horarios[ativos, -colunas:]
+
+        resultado = detectar(precos, **parametros)
+        # Só interessa a última coluna: o que o refresh mais novo de cada ticker completou
+        for padrao, (mascara, valor) in resultado.items():
+            resultado[padrao] = mascara[:, -1:], valor[:, -1:]
+
+        rotulos = ativos if nomes is None else np.array([nomes.get(int(i), str(i)) for i in ativos], dtype=object)
+        return tabela_de_sinais(resultado, rotulos, horarios[:, -1:])
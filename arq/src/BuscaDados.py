@@ -1,76 +1,31 @@
-import yfinance as yf
 import pandas as pd
 import time
 from pathlib import Path
 import os
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent / 'banco' / 'connection'))
+import classSnapshots
+import resumo
+import provedores
 
 def consulta(lista_tickers):
     print("Iniciando consulta")
     inicio = time.time()
 
-    tickers_formatados = [t + ".SA" 
-                          if not t.endswith(".SA") else t 
-                          for t in lista_tickers]
+    tickers_formatados = resumo.formatar_tickers(lista_tickers)
     
-    string_tickers = " ".join(tickers_formatados)
+    dados = provedores.padrao().baixar(tickers_formatados, period="2d")
 
-    dados = yf.download(string_tickers, period="2d", group_by='ticker', threads=True, progress=False)
-
-    lista_final = []
-
-    for ticker in tickers_formatados:
-        try:
-            # Acessa os dados desse ticker
-            df_ativo = dados[ticker]
-            df_ativo = df_ativo.dropna()
-
-            if len(df_ativo) < 1:
-                continue
-
-            # Pega preço atual
-            preco_atual = df_ativo['Close'].iloc[-1]
-            
-            # Tenta calcular variação
-            if len(df_ativo) >= 2:
-                fechamento_ontem = df_ativo['Close'].iloc[-2]
-                var_reais = preco_atual - fechamento_ontem
-                var_pct = (var_reais / fechamento_ontem) * 100
-            else:
-                var_reais = 0.0
-                var_pct = 0.0
-
-            # Limpa o nome
-            simbolo_limpo = ticker.replace(".SA", "")
-            
-            lista_final.append({
-                "Ativo": simbolo_limpo,
-                "Preço": f"R$ {preco_atual:.2f}",
-                "Var R$": f"{var_reais:+.2f}",
-                "Var %": f"{var_pct:+.2f}%",
-                "Status": "Alta" if var_reais > 0 else ("Baixa" if var_reais < 0 else "Neutro")
-            })
-
-        except KeyError:
-            print(f"Erro: Dados não encontrados para {ticker}")
-            continue
+    df_final = resumo.resumir_cotacoes(dados, tickers_formatados)
 
     fim = time.time()
     print(f"Tempo {fim - inicio:.2f}")
     
-    return pd.DataFrame(lista_final)
+    return df_final
 
 def salvar_dados(arquivo):
-    data = pd.Timestamp.now().strftime("%Hh-%Mm-%Ss_-_%d-%m")
-
-    path = Path(__file__).parent.parent.parent.resolve()
-    nome_arquivo = path /'banco'/ 'esquemas' / 'dado-do-dia' / f'{data}.json'
-
-    arquivo.to_json(
-        nome_arquivo, 
-        orient="records",   # Cria uma lista de objetoS
-        indent=4,           # Deixa o JSON legível 
-        force_ascii=False   # Permite acentos 
-    )
+    horario = pd.Timestamp.now()
+    nome_arquivo = classSnapshots.Snapshots().salvar(resumo.registros_snapshot(arquivo, horario), horario)
     
     print(f"\nArquivo salvo com sucesso em: {os.path.abspath(nome_arquivo)}")
 
@@ -0,0 +1,75 @@
+import math
+import threading
+import time
+
+import calendario
+
+
+class Agendador:
+    """Roda uma tarefa a cada `intervalo` segundos, só durante o pregão da B3
+
+    Os horários seguem uma grade fixa (início + k * intervalo), então o tempo gasto
+    pela tarefa não empurra os próximos ciclos. Se a execução anterior ainda estiver
+    rodando quando chegar a hora, o ciclo é pulado em vez de empilhar outra busca.
+    """
+
+    def __init__(self, tarefa, intervalo=300, calendario_b3=None):
+        self.tarefa = tarefa
+        self.intervalo = intervalo
+        self.calendario = calendario_b3 if calendario_b3 is not None else calendario.CalendarioB3()
+        self.parado = threading.Event()
+        self.trabalho = None
+        self.ciclos = 0
+        self.pulados = 0
+
+    def executar(self):
+        inicio = time.monotonic()
+        try:
+            self.tarefa()
+        except Exception as e:
+            print(f"Erro na tarefa agendada: {e}")
+        print(f"Ciclo concluído em {time.monotonic() - inicio:.2f}s")
+
+    def disparar(self):
+        """Começa um ciclo, a menos que o anterior ainda esteja rodando"""
+        if self.trabalho is not None and self.trabalho.is_alive():
+            self.pulados += 1
+            print("Ciclo pulado: a busca anterior ainda não terminou")
+            return
+
+        self.ciclos += 1
+        self.trabalho = threading.Thread(target=self.executar, daemon=True)
+        self.trabalho.start()
+
+    def iniciar(self):
+        """Loop principal (bloqueia até parar() ser chamado)"""
+        proximo = time.monotonic()
+
+        while not self.parado.is_set():
+            agora = self.calendario.agora()
+
+            if not self.calendario.em_pregao(agora):
+                abertura = self.calendario.proxima_abertura(agora)
+                print(f"Mercado fechado. Próximo pregão: {abertura:%d/%m/%Y %H:%M}")
+
+                if self.parado.wait((abertura - agora).total_seconds()):
+                    break
+                proximo = time.monotonic()
+                continue
+
+            self.disparar()
+
+            # Correção de deriva: o próximo horário vem da grade, não do fim da execução
+            proximo += self.intervalo
+            atraso = time.monotonic() - proximo
+            if atraso > 0:
+                # Perdeu horários (máquina suspensa, por exemplo): pula para o próximo da grade
+                proximo += math.ceil(atraso / self.intervalo) * self.intervalo
+
+            self.parado.wait(proximo - time.monotonic())
+
+        if self.trabalho is not None:
+            self.trabalho.join()
+
+    def parar(self):
+        self.parado.set()
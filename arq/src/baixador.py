@@ -0,0 +1,149 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+import provedores
+
+
+class LoteVazio(ValueError):
+    """O provedor respondeu, mas sem nenhuma cotação para o lote
+
+    Pode ser ticker que não existe mais ou rede fora (o yf.download devolve um quadro vazio
+    nos dois casos): quem junta os lotes de uma busca decide qual foi (BaDa.registrar_busca).
+    """
+
+
+class Baixador:
+    """Baixa uma lista grande de tickers em lotes, em paralelo, com repetição só dos lotes que falharem
+
+    Os lotes só rodam juntos se o provedor for SEGURO_ENTRE_THREADS; o Yahoo é um por vez.
+
+    O tamanho do lote se ajusta sozinho: se um lote demora mais que o tempo_alvo ele
+    diminui, se termina rápido ele aumenta. O tamanho aprendido vale para as próximas buscas.
+    """
+
+    def __init__(self, provedor=None, tamanho_lote=50, max_workers=4, tentativas=3, tempo_alvo=5.0,
+                 tamanho_minimo=5, tamanho_maximo=200, espera=1.0, timeout=15):
+        self.provedor = provedor if provedor is not None else provedores.padrao()
+        self.tamanho_lote = tamanho_lote
+        self.max_workers = max_workers
+        self.tentativas = tentativas
+        self.tempo_alvo = tempo_alvo
+        self.tamanho_minimo = tamanho_minimo
+        self.tamanho_maximo = tamanho_maximo
+        self.espera = espera # Segundos de espera antes de repetir um lote (multiplicado pela tentativa)
+        self.timeout = timeout # Timeout de cada chamada ao provedor
+        self.relatorio = []
+        self.falhas = []
+
+    def baixar_lote(self, lote, tentativa, **kwargs):
+        """Baixa um lote e devolve (dados, tempo). Lança LoteVazio se o lote voltar sem cotação"""
+        if tentativa > 1:
+            time.sleep(self.espera * (tentativa - 1))
+
+        inicio = time.time()
+        dados = self.provedor.baixar(lote, timeout=self.timeout, **kwargs)
+        tempo = time.time() - inicio
+
+        if dados is None:
+            raise ValueError("Provedor sem resposta")
+
+        if dados.empty or dados.isna().all().all():
+            raise LoteVazio("Lote sem dados")
+
+        # Com um único ticker o yf.download pode devolver colunas sem o nível do ticker
+        if not isinstance(dados.columns, pd.MultiIndex):
+            dados = pd.concat({lote[0]: dados}, axis=1)
+
+        return dados, tempo
+
+    def paralelos(self):
+        """Quantos lotes podem ser baixados ao mesmo tempo com este provedor"""
+        return self.max_workers if self.provedor.SEGURO_ENTRE_THREADS else 1
+
+    def ajustar_tamanho(self, tempo, quantidade):
+        """Recalcula o tamanho do lote a partir do tempo por ticker observado"""
+        if quantidade == 0 or tempo <= 0:
+            return
+
+        por_ticker = tempo / quantidade
+        ideal = int(self.tempo_alvo / por_ticker)
+
+        # Suaviza para não oscilar entre um lote e outro
+        novo = (self.tamanho_lote + ideal) // 2
+        self.tamanho_lote = max(self.tamanho_minimo, min(self.tamanho_maximo, novo))
+
+    def baixar_em_lotes(self, tickers_formatados, **kwargs):
+        """Gerador: devolve (lote, dados) assim que cada lote termina
+
+        dados é None quando o lote falhou em todas as tentativas; o lote é devolvido
+        mesmo assim para quem consome poder contar o progresso. Se a última tentativa
+        voltou sem cotação (LoteVazio), dados é um DataFrame vazio.
+        """
+        self.relatorio = []
+        self.falhas = []
+
+        pendentes = deque(tickers_formatados)
+        repetir = deque() # (número, lote, tentativa) que falharam e ainda podem ser repetidos
+        em_andamento = {}
+        numero = 0
+        inicio = time.time()
+
+        paralelos = self.paralelos()
+        with ThreadPoolExecutor(max_workers=paralelos) as executor:
+            while pendentes or repetir or em_andamento:
+
+                # Mantém o pool cheio, dando prioridade aos lotes que falharam
+                while (pendentes or repetir) and len(em_andamento) < paralelos:
+                    if repetir:
+                        n, lote, tentativa = repetir.popleft()
+                    else:
+                        tamanho = min(self.tamanho_lote, len(pendentes))
+                        lote = [pendentes.popleft() for _ in range(tamanho)]
+                        tentativa = 1
+                        numero += 1
+                        n = numero
+
+                    futuro = executor.submit(self.baixar_lote, lote, tentativa, **kwargs)
+                    em_andamento[futuro] = (n, lote, tentativa)
+
+                feitos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+
+                for futuro in feitos:
+                    n, lote, tentativa = em_andamento.pop(futuro)
+
+                    try:
+                        dados, tempo = futuro.result()
+                    except Exception as e:
+                        self.relatorio.append({"lote": n, "tickers": len(lote), "tentativa": tentativa,
+                                               "tempo": None, "ok": False, "erro": str(e)})
+                        if tentativa < self.tentativas:
+                            print(f"Lote {n} falhou ({e}), tentativa {tentativa}/{self.tentativas}")
+                            repetir.append((n, lote, tentativa + 1))
+                        else:
+                            print(f"Erro: Lote {n} desistido depois de {tentativa} tentativas: {', '.join(lote)}")
+                            self.falhas.extend(lote)
+                            yield lote, pd.DataFrame() if isinstance(e, LoteVazio) else None
+                        continue
+
+                    self.relatorio.append({"lote": n, "tickers": len(lote), "tentativa": tentativa,
+                                           "tempo": tempo, "ok": True, "erro": None})
+                    print(f"Lote {n}: {len(lote)} tickers em {tempo:.2f}s")
+
+                    self.ajustar_tamanho(tempo, len(lote))
+                    yield lote, dados
+
+        print(f"Download: {len(tickers_formatados)} tickers, {numero} lotes, {time.time() - inicio:.2f}s "
+              f"(próximo lote: {self.tamanho_lote})")
+
+    def baixar(self, tickers_formatados, **kwargs):
+        """Baixa todos os tickers e devolve um único DataFrame MultiIndex (ticker, campo)"""
+        partes = [dados for _, dados in self.baixar_em_lotes(tickers_formatados, **kwargs)
+                  if dados is not None and not dados.empty]
+
+        if not partes:
+            return pd.DataFrame()
+
+        return pd.concat(partes, axis=1)
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheCotacoes:
+    """Cache em memória de cotações por (ticker, intervalo), com validade (ttl) e descarte LRU
+
+    Quem pede chaves que já estão sendo baixadas por outra thread não baixa de novo:
+    espera o download em andamento terminar (single-flight).
+    """
+
+    def __init__(self, ttl=60, maximo=5000):
+        self.ttl = ttl # Segundos que uma cotação continua valendo
+        self.maximo = maximo # Quantidade máxima de chaves guardadas
+        self.dados = OrderedDict() # chave -> (horario, valor), do menos para o mais usado
+        self.em_andamento = {} # chave -> Event de quem está baixando
+        self.trava = threading.Lock()
+
+    def valido(self, horario):
+        return time.monotonic() - horario < self.ttl
+
+    def pegar(self, chave):
+        """Valor da chave se ainda estiver válido, senão None"""
+        with self.trava:
+            item = self.dados.get(chave)
+            if item is None or not self.valido(item[0]):
+                return None
+            self.dados.move_to_end(chave)
+            return item[1]
+
+    def guardar(self, chave, valor):
+        with self.trava:
+            self.guardar_sem_trava(chave, valor)
+
+    def guardar_sem_trava(self, chave, valor):
+        self.dados[chave] = (time.monotonic(), valor)
+        self.dados.move_to_end(chave)
+
+        # Descarta os menos usados
+        while len(self.dados) > self.maximo:
+            self.dados.popitem(last=False)
+
+    def reservar(self, chaves):
+        """Separa as chaves em (prontos, meus, alheios)
+
+        prontos: {chave: valor} já válidos no cache
+        meus: chaves que ninguém está baixando; quem chamou fica responsável por elas
+              e TEM que chamar liberar() depois (mesmo se der erro)
+        alheios: {chave: Event} de chaves que outra thread já está baixando
+        """
+        prontos, meus, alheios = {}, [], {}
+
+        with self.trava:
+            for chave in chaves:
+                item = self.dados.get(chave)
+                if item is not None and self.valido(item[0]):
+                    self.dados.move_to_end(chave)
+                    prontos[chave] = item[1]
+                elif chave in self.em_andamento:
+                    alheios[chave] = self.em_andamento[chave]
+                else:
+                    self.em_andamento[chave] = threading.Event()
+                    meus.append(chave)
+
+        return prontos, meus, alheios
+
+    def liberar(self, chaves, valores=None):
+        """Guarda os valores baixados e acorda quem estava esperando por essas chaves"""
+        valores = valores or {}
+
+        with self.trava:
+            for chave in chaves:
+                if chave in valores:
+                    self.guardar_sem_trava(chave, valores[chave])
+                evento = self.em_andamento.pop(chave, None)
+                if evento is not None:
+                    evento.set()
+
+    def esperar(self, alheios, timeout=None):
+        """Espera os downloads de outras threads e devolve {chave: valor} do que ficou pronto"""
+        resultado = {}
+        for chave, evento in alheios.items():
+            evento.wait(timeout)
+            valor = self.pegar(chave)
+            if valor is not None:
+                resultado[chave] = valor
+        return resultado
+
+    def limpar(self):
+        with self.trava:
+            self.dados.clear()
+
+
+# Instância única do processo
+CACHE = CacheCotacoes(ttl=60)
@@ -0,0 +1,104 @@
+import datetime as dt
+from functools import lru_cache
+
+# O Brasil não tem mais horário de verão (desde 2019), então Brasília é sempre UTC-3
+FUSO_B3 = dt.timezone(dt.timedelta(hours=-3), "BRT")
+
+# Feriados de data fixa em que a B3 não abre (dia, mês)
+FERIADOS_FIXOS = [
+    (1, 1),    # Confraternização Universal
+    (21, 4),   # Tiradentes
+    (1, 5),    # Dia do Trabalho
+    (7, 9),    # Independência
+    (12, 10),  # Nossa Senhora Aparecida
+    (2, 11),   # Finados
+    (15, 11),  # Proclamação da República
+    (20, 11),  # Consciência Negra
+    (24, 12),  # Véspera de Natal
+    (25, 12),  # Natal
+    (31, 12),  # Último dia do ano
+]
+
+
+def pascoa(ano):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)"""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = ((h + l - 7 * m + 114) % 31) + 1
+    return dt.date(ano, mes, dia)
+
+
+@lru_cache(maxsize=None)
+def feriados(ano):
+    """Conjunto com todos os dias sem pregão do ano (fixos + móveis)"""
+    dias = {dt.date(ano, mes, dia) for dia, mes in FERIADOS_FIXOS}
+
+    p = pascoa(ano)
+    dias.add(p - dt.timedelta(days=48)) # Segunda de Carnaval
+    dias.add(p - dt.timedelta(days=47)) # Terça de Carnaval
+    dias.add(p - dt.timedelta(days=2))  # Sexta-feira Santa
+    dias.add(p + dt.timedelta(days=60)) # Corpus Christi
+    return frozenset(dias)
+
+
+class CalendarioB3:
+    """Dias e horários de pregão da B3"""
+
+    def __init__(self, abertura=dt.time(10, 0), fechamento=dt.time(17, 0), feriados_extras=()):
+        self.abertura = abertura
+        self.fechamento = fechamento
+        self.feriados_extras = set(feriados_extras)
+
+    def dia_de_pregao(self, data):
+        return (data.weekday() < 5
+                and data not in feriados(data.year)
+                and data not in self.feriados_extras)
+
+    def horario_do_pregao(self, data):
+        """(início, fim) do pregão do dia, com fuso. Na Quarta de Cinzas o pregão só começa às 13h"""
+        abertura = self.abertura
+        if data == pascoa(data.year) - dt.timedelta(days=46):
+            abertura = max(abertura, dt.time(13, 0))
+
+        inicio = dt.datetime.combine(data, abertura, tzinfo=FUSO_B3)
+        fim = dt.datetime.combine(data, self.fechamento, tzinfo=FUSO_B3)
+        return inicio, fim
+
+    def agora(self):
+        return dt.datetime.now(FUSO_B3)
+
+    def em_pregao(self, momento=None):
+        momento = (momento or self.agora()).astimezone(FUSO_B3)
+        if not self.dia_de_pregao(momento.date()):
+            return False
+        inicio, fim = self.horario_do_pregao(momento.date())
+        return inicio <= momento < fim
+
+    def proxima_abertura(self, momento=None):
+        """Início do próximo pregão (ou o próprio momento se o mercado já estiver aberto)"""
+        momento = (momento or self.agora()).astimezone(FUSO_B3)
+        if self.em_pregao(momento):
+            return momento
+
+        data = momento.date()
+        while True:
+            if self.dia_de_pregao(data):
+                inicio, _ = self.horario_do_pregao(data)
+                if inicio > momento:
+                    return inicio
+            data += dt.timedelta(days=1)
+
+
+if __name__ == "__main__":
+    c = CalendarioB3()
+    print(f"Em pregão: {c.em_pregao()}")
+    print(f"Próxima abertura: {c.proxima_abertura():%d/%m/%Y %H:%M}")
+    print(sorted(feriados(c.agora().year)))
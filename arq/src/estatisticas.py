@@ -0,0 +1,169 @@
+import threading
+import numpy as np
+import pandas as pd
+
+
+class EstatisticasOnline:
+    """Estatísticas de cada ticker atualizadas a cada cotação que chega, sem reler o histórico
+
+    O estado fica em arrays NumPy indexados pelo id da tabela ativos, então um refresh
+    inteiro é atualizado com algumas operações vetoriais (O(1) por cotação):
+      - média e variância acumuladas (Welford)
+      - EMA em vários períodos (spans)
+      - máxima, mínima e VWAP do dia (zeram quando o dia muda)
+
+    O VWAP usa o volume acumulado do pregão que vem em cada cotação: o volume negociado
+    entre um refresh e outro é a diferença, e entra com o preço do refresh.
+    """
+
+    CAMPOS = ("n", "media", "m2", "ultimo", "dia", "maxima", "minima", "volume_dia", "soma_pv", "soma_v")
+
+    def __init__(self, spans=(9, 21, 50), capacidade=256):
+        self.spans = tuple(spans)
+        self.alfas = 2.0 / (np.asarray(self.spans, dtype=np.float64) + 1.0)
+        self.trava = threading.Lock()
+        self.capacidade = 0
+        self.crescer(capacidade)
+
+    def crescer(self, capacidade):
+        """Aumenta os arrays para caber ids até capacidade - 1, mantendo o que já existe"""
+        antigos = {campo: getattr(self, campo) for campo in self.CAMPOS + ("ema",)} if self.capacidade else {}
+        extra = capacidade - self.capacidade
+
+        def novo(campo, valor, dtype):
+            inicial = np.full(extra, valor, dtype=dtype)
+            return np.concatenate([antigos[campo], inicial]) if antigos else inicial
+
+        self.n = novo("n", 0, np.int64)
+        self.media = novo("media", 0.0, np.float64)
+        self.m2 = novo("m2", 0.0, np.float64)
+        self.ultimo = novo("ultimo", np.nan, np.float64)
+        self.dia = novo("dia", -1, np.int32) # Dias desde 1970 do último registro
+        self.maxima = novo("maxima", np.nan, np.float64)
+        self.minima = novo("minima", np.nan, np.float64)
+        self.volume_dia = novo("volume_dia", 0.0, np.float64) # Último volume acumulado visto no dia
+        self.soma_pv = novo("soma_pv", 0.0, np.float64)
+        self.soma_v = novo("soma_v", 0.0, np.float64)
+
+        ema = np.full((len(self.spans), extra), np.nan)
+        self.ema = np.concatenate([antigos["ema"], ema], axis=1) if antigos else ema
+
+        self.capacidade = capacidade
+
+    def atualizar(self, ids, precos, horario, volumes=None):
+        """Soma um lote de cotações (um refresh) ao estado
+
+        ids: id de cada ticker na tabela ativos; precos: último preço; volumes: volume
+        acumulado do pregão (opcional). Um mesmo id pode aparecer mais de uma vez: as
+        ocorrências são aplicadas na ordem.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        precos = np.asarray(precos, dtype=np.float64)
+        volumes = np.full(len(ids), np.nan) if volumes is None else np.asarray(volumes, dtype=np.float64)
+
+        validos = ~np.isnan(precos)
+        ids, precos, volumes = ids[validos], precos[validos], volumes[validos]
+        if len(ids) == 0:
+            return
+
+        dia = np.int32(pd.Timestamp(horario).normalize().value // 86_400_000_000_000)
+
+        with self.trava:
+            if ids.max() >= self.capacidade:
+                self.crescer(max(int(ids.max()) + 1, self.capacidade * 2))
+
+            # Repetidos no mesmo lote: uma passada por ocorrência (a 1ª de cada id, depois a 2ª...)
+            ordem = pd.Series(ids).groupby(ids).cumcount().to_numpy()
+            for rodada in range(ordem.max() + 1):
+                parte = ordem == rodada
+                self.atualizar_unicos(ids[parte], precos[parte], volumes[parte], dia)
+
+    def atualizar_unicos(self, ids, precos, volumes, dia):
+        # Welford: média e soma dos quadrados dos desvios, sem guardar os preços
+        n = self.n[ids] + 1
+        delta = precos - self.media[ids]
+        media = self.media[ids] + delta / n
+        self.m2[ids] += delta * (precos - media)
+        self.media[ids] = media
+        self.n[ids] = n
+        self.ultimo[ids] = precos
+
+        # EMA de cada span; a primeira cotação do ticker vira o valor inicial
+        ema = self.ema[:, ids]
+        self.ema[:, ids] = np.where(np.isnan(ema), precos, ema + self.alfas[:, None] * (precos - ema))
+
+        # Dia novo: zera máxima, mínima e VWAP
+        novo_dia = self.dia[ids] != dia
+        zerar = ids[novo_dia]
+        self.maxima[zerar] = np.nan
+        self.minima[zerar] = np.nan
+        self.volume_dia[zerar] = 0.0
+        self.soma_pv[zerar] = 0.0
+        self.soma_v[zerar] = 0.0
+        self.dia[ids] = dia
+
+        self.maxima[ids] = np.fmax(self.maxima[ids], precos)
+        self.minima[ids] = np.fmin(self.minima[ids], precos)
+
+        # Volume negociado desde o último refresh (o acumulado nunca diminui no mesmo dia)
+        tem_volume = ~np.isnan(volumes)
+        com_volume = ids[tem_volume]
+        negociado = np.maximum(volumes[tem_volume] - self.volume_dia[com_volume], 0.0)
+        self.soma_pv[com_volume] += precos[tem_volume] * negociado
+        self.soma_v[com_volume] += negociado
+        self.volume_dia[com_volume] = np.maximum(self.volume_dia[com_volume], volumes[tem_volume])
+
+    def atualizar_resumo(self, df_resumo, ids_ativos, horario):
+        """Atualiza a partir do resumo numérico de um refresh; ids_ativos: {ticker: id}"""
+        ids = df_resumo["Ativo"].map(ids_ativos)
+        conhecidos = ids.notna().to_numpy()
+        volumes = df_resumo["Volume"] if "Volume" in df_resumo.columns else None
+
+        self.atualizar(
+            ids[conhecidos].to_numpy(dtype=np.int64),
+            df_resumo["Preço"].to_numpy(dtype=np.float64)[conhecidos],
+            horario,
+            None if volumes is None else volumes.to_numpy(dtype=np.float64)[conhecidos],
+        )
+
+    def indicadores(self, ids=None):
+        """DataFrame (índice = id do ativo) com os indicadores atuais de quem já tem cotação"""
+        with self.trava:
+            if ids is None:
+                ids = np.flatnonzero(self.n > 0)
+            ids = np.asarray(ids, dtype=np.int64)
+
+            n = self.n[ids]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                desvio = np.sqrt(np.where(n > 1, self.m2[ids] / (n - 1), np.nan))
+                vwap = np.where(self.soma_v[ids] > 0, self.soma_pv[ids] / self.soma_v[ids], np.nan)
+
+            colunas = {
+                "n": n,
+                "ultimo": self.ultimo[ids],
+                "media": self.media[ids],
+                "desvio": desvio,
+            }
+            for span, ema in zip(self.spans, self.ema[:, ids]):
+                colunas[f"ema_{span}"] = ema
+            colunas.update({
+                "maxima_dia": self.maxima[ids],
+                "minima_dia": self.minima[ids],
+                "vwap": vwap,
+            })
+
+        return pd.DataFrame(colunas, index=pd.Index(ids, name="ativo_id"))
+
+    def salvar(self, arquivo):
+        """Guarda o estado num .npz, para continuar de onde parou depois de reiniciar"""
+        with self.trava:
+            np.savez(arquivo, spans=np.asarray(self.spans), ema=self.ema,
+                     **{campo: getattr(self, campo) for campo in self.CAMPOS})
+
+    @classmethod
+    def carregar(cls, arquivo):
+        with np.load(arquivo) as dados:
+            estatisticas = cls(spans=dados["spans"].tolist(), capacidade=len(dados["n"]))
+            for campo in cls.CAMPOS + ("ema",):
+                setattr(estatisticas, campo, dados[campo].copy())
+        return estatisticas
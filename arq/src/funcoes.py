@@ -1,184 +1,219 @@
-import threading
-import requests
+import asyncio
 import webbrowser
-from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor
 import os
 
 from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent / 'banco' / 'connection'))
+sys.path.append(str(Path(__file__).parent.parent.parent / 'analise'))
 import classBanco
-import yfinance as yf
+import classBarras
+import classTicks
+import classSnapshots
+import resumo
+import baixador
+import provedores
+import cache
+import motor
+import gravador
+import estatisticas
+import varredura
 import pandas as pd
 import time
 
+# Instância única para o tamanho de lote aprendido valer entre uma busca e outra
+BAIXADOR = baixador.Baixador(provedor=provedores.padrao())
+
+# Cache compartilhado por todas as buscas do processo (UI, linha de comando)
+CACHE = cache.CACHE
+
 def processo_de_busca():
     bd_invest = classBanco.BaDa()
     lista_tickers = bd_invest.carregar_ticker()
 
     inicio = time.time()
 
-    tickers_formatados = [t + ".SA" 
-                          if not t.endswith(".SA") else t 
-                          for t in lista_tickers]
-    
-    string_tickers = " ".join(tickers_formatados)
-
-    dados = yf.download(string_tickers, period="2d", group_by='ticker', threads=True, progress=False)
+    tickers_formatados = resumo.formatar_tickers(lista_tickers)
 
-    lista_final = []
-
-    for ticker in tickers_formatados:
-        try:
-            # Acessa os dados desse ticker
-            df_ativo = dados[ticker]
-            df_ativo = df_ativo.dropna()
-
-            if len(df_ativo) < 1:
-                continue
-
-            # Pega preço atual
-            preco_atual = df_ativo['Close'].iloc[-1]
-            
-            # Tenta calcular variação
-            if len(df_ativo) >= 2:
-                fechamento_ontem = df_ativo['Close'].iloc[-2]
-                var_reais = preco_atual - fechamento_ontem
-                var_pct = (var_reais / fechamento_ontem) * 100
-            else:
-                var_reais = 0.0
-                var_pct = 0.0
-
-            # Limpa o nome
-            simbolo_limpo = ticker.replace(".SA", "")
-            
-            lista_final.append({
-                "Ativo": simbolo_limpo,
-                "Preço": f"R$ {preco_atual:.2f}",
-                "Var R$": f"{var_reais:+.2f}",
-                "Var %": f"{var_pct:+.2f}%",
-                "Status": "Alta" if var_reais > 0 else ("Baixa" if var_reais < 0 else "Neutro")
-            })
-
-        except KeyError:
-            print(f"Erro: Dados não encontrados para {ticker}")
-            continue
+    df_final = buscar_resumo(tickers_formatados)
 
     fim = time.time()
     print(f"Tempo {fim - inicio:.2f}")
 
-    df_final = pd.DataFrame(lista_final)
-    t = threading.Thread(target= salvar_dados, args=(df_final,)) 
-    t.start()
+    persistir(df_final)
 
     print("Sem Problemas")
     return df_final
 
-def busca_noticia():
-    links = {
-        "https://investnews.com.br/economia/page/540/?_gl=1%2Ali6itt%2Agclid%2AQ2p3S0NBanctYi1rQmhCLUVpd0E0ZnZLckVuMS1NV1lpRWswLTJWalpSbURoX2tGTU43b3dWQXpKNE1tc3V0SnBMZkhKN3FzNXRESm1Cb0NELXNRQXZEX0J3RQ..%2A_gcl_aw%2AR0NMLjE2ODcyODU1NzIuQ2p3S0NBanctYi1rQmhCLUVpd0E0ZnZLckVuMS1NV1lpRWswLTJWalpSbURoX2tGTU43b3dWQXpKNE1tc3V0SnBMZkhKN3FzNXRESm1Cb0NELXNRQXZEX0J3RQ..&noamp=mobile&gad_source=1&gad_campaignid=17459268635&gclid=CjwKCAiAqKbMBhBmEiwAZ3UboPjtNpeA1nAIdZIkw3sKxjCBLdy0mo8WZ4oz3Hjq9ft6ih084H4oeRoC_ncQAvD_BwE": ["category-posts-content","h2"],
-        "https://g1.globo.com/economia/" : ["column areatemplate-esquerda large-15 large-offset-0 xlarge-14 xlarge-offset-1 float-left","h2"],
-        "https://www.infomoney.com.br/economia/" : ["max-w-9xl mx-auto","h2"],
-        "https://www.cnnbrasil.com.br/economia/": ["grid lg:grid-cols-3 lg:gap-8 lg:border-t lg:border-neutral-300 lg:py-0 lg:pb-8 lg:pt-8 lg:*:py-0","h2"],
-        "https://g1.globo.com/politica/": ["theme","h2"],
-        "https://www.cnnbrasil.com.br/politica/": ["lg:mt-2","h3"],
-        "https://noticias.uol.com.br/politica/": ["flex-wrap ","h3"],
-        "https://jovempan.com.br/noticias/politica": ["main col-md-8","h2"]
-    }
-
-    noticias = []
-
-    for link, acha in links.items():
-        try:
-            resposta = requests.get(link)
-            soup = BeautifulSoup(resposta.content, 'html.parser')
-                
-            news_lista = soup.find(class_= f'{acha[0]}')
-            ultimas = news_lista.find_all(f'{acha[1]}')
-
-            noticias.append(ultimas)
-
-        except:
-             print(f'Erro no {link}' )
-    
-    dic_news={}
-
-    for news in ultimas:
-        link = news.find('a')
-        dic_news[f'{news.text}'] = link.attrs['href']
-        #print(f"Artigo: {news.text}\n  Link: {link.attrs['href']}")
+def baixar_incremental_em_lotes(tickers_formatados, barras=None, baixador=None, banco=None):
+    """Gerador: salva cada lote baixado no banco de barras e devolve (lote, concluidos, total)
+
+    No fim, tickers que voltaram vazios contam falha na quarentena do banco
+    (classBanco.BaDa.registrar_busca), a não ser que a busca inteira tenha voltado vazia.
+    """
+    if barras is None:
+        barras = classBarras.Barras()
+    if baixador is None:
+        baixador = BAIXADOR
+    if banco is None:
+        banco = classBanco.BaDa()
+
+    total = len(tickers_formatados)
+    concluidos = 0
+    respostas = []
+
+    for grupo, argumentos in barras.grupos_de_download(tickers_formatados):
+        for lote, dados in baixador.baixar_em_lotes(grupo, **argumentos):
+            # Lote que deu erro em todas as tentativas não diz nada sobre os tickers
+            if dados is not None:
+                barras.salvar(dados, lote)
+                respostas.append((lote, resumo.tickers_com_dados(dados, lote)))
+            concluidos += len(lote)
+            yield lote, concluidos, total
+
+    banco.registrar_busca(respostas)
+
+def baixar_incremental(tickers_formatados, barras=None, baixador=None, banco=None):
+    """Baixa só os pregões que ainda não estão no banco e devolve os 2 últimos de cada ticker"""
+    if barras is None:
+        barras = classBarras.Barras()
+
+    for _ in baixar_incremental_em_lotes(tickers_formatados, barras, baixador, banco):
+        pass
+
+    return barras.carregar(tickers_formatados, quantidade=2)
+
+def buscar_em_lotes(tickers_formatados, barras=None, baixador=None, cache_cotacoes=None, intervalo="1d"):
+    """Gerador: devolve (resumo do lote, concluidos, total) conforme cada lote termina de baixar
+
+    O que ainda está válido no cache sai primeiro, sem download. O que outra busca já
+    está baixando não é pedido de novo: espera aquela busca terminar.
+    """
+    if barras is None:
+        barras = classBarras.Barras()
+    if cache_cotacoes is None:
+        cache_cotacoes = CACHE
+
+    total = len(tickers_formatados)
+    prontos, meus, alheios = cache_cotacoes.reservar([(t, intervalo) for t in tickers_formatados])
+    concluidos = len(prontos)
+
+    if prontos:
+        yield resumo.resumo_de_linhas(prontos.values()), concluidos, total
+
+    pendentes = [t for t, _ in meus]
+    try:
+        for lote, _, _ in baixar_incremental_em_lotes(pendentes, barras, baixador):
+            df_lote = resumo.resumir_cotacoes(barras.carregar(lote, quantidade=2), lote)
+
+            valores = {(t, intervalo): linha for t, linha in resumo.linhas_por_ticker(df_lote).items()}
+            cache_cotacoes.liberar([(t, intervalo) for t in lote], valores)
+
+            concluidos += len(lote)
+            yield df_lote, concluidos, total
+    finally:
+        # Libera quem estiver esperando mesmo se o download falhar no meio
+        cache_cotacoes.liberar(meus)
+
+    if alheios:
+        valores = cache_cotacoes.esperar(alheios)
+        yield resumo.resumo_de_linhas(valores.values()), total, total
+
+def buscar_resumo(tickers_formatados, barras=None, baixador=None, cache_cotacoes=None):
+    """Resumo numérico de todos os tickers de uma vez (passando pelo cache)"""
+    partes = [df for df, _, _ in buscar_em_lotes(tickers_formatados, barras, baixador, cache_cotacoes)]
+    if not partes:
+        return resumo.resumo_vazio()
+
+    df_final = pd.concat(partes, ignore_index=True)
+    df_final["Status"] = pd.Categorical(df_final["Status"], categories=resumo.STATUS)
+    return df_final
 
-    return dic_news
+def busca_noticia():
+    """Manchetes de todas as fontes, buscadas ao mesmo tempo: {título: link}"""
+    return asyncio.run(motor.MotorAsync().buscar_noticias())
 
 def consulta(lista_tickers):
     print("Iniciando consulta")
     inicio = time.time()
 
-    tickers_formatados = [t + ".SA" 
-                          if not t.endswith(".SA") else t 
-                          for t in lista_tickers]
+    tickers_formatados = resumo.formatar_tickers(lista_tickers)
     
-    string_tickers = " ".join(tickers_formatados)
+    dados = BAIXADOR.provedor.baixar(tickers_formatados, period="2d")
 
-    dados = yf.download(string_tickers, period="2d", group_by='ticker', threads=True, progress=False)
-
-    lista_final = []
-
-    for ticker in tickers_formatados:
-        try:
-            # Acessa os dados desse ticker
-            df_ativo = dados[ticker]
-            df_ativo = df_ativo.dropna()
-
-            if len(df_ativo) < 1:
-                continue
-
-            # Pega preço atual
-            preco_atual = df_ativo['Close'].iloc[-1]
-            
-            # Tenta calcular variação
-            if len(df_ativo) >= 2:
-                fechamento_ontem = df_ativo['Close'].iloc[-2]
-                var_reais = preco_atual - fechamento_ontem
-                var_pct = (var_reais / fechamento_ontem) * 100
-            else:
-                var_reais = 0.0
-                var_pct = 0.0
-
-            # Limpa o nome
-            simbolo_limpo = ticker.replace(".SA", "")
-            
-            lista_final.append({
-                "Ativo": simbolo_limpo,
-                "Preço": f"R$ {preco_atual:.2f}",
-                "Var R$": f"{var_reais:+.2f}",
-                "Var %": f"{var_pct:+.2f}%",
-                "Status": "Alta" if var_reais > 0 else ("Baixa" if var_reais < 0 else "Neutro")
-            })
-
-        except KeyError:
-            print(f"Erro: Dados não encontrados para {ticker}")
-            continue
+    df_final = resumo.resumir_cotacoes(dados, tickers_formatados)
 
     fim = time.time()
     print(f"Tempo {fim - inicio:.2f}")
     
-    return pd.DataFrame(lista_final)
+    return df_final
 
-def salvar_dados(arquivo):
-    data = pd.Timestamp.now().strftime("%Hh-%Mm-%Ss_-_%d-%m")
+def gravar_refreshes(itens):
+    """Grava vários refreshes [(df_resumo, horario)]: um JSON por refresh e todos numa transação só"""
+    for df_resumo, horario in itens:
+        salvar_dados(resumo.registros_snapshot(df_resumo, horario), horario)
+
+    banco = classBanco.BaDa()
+    ids = banco.ids_ativos()
+    with banco.conexoes.transacao():
+        for df_resumo, horario in itens:
+            banco.salvar_cotacoes(df_resumo, horario)
+            # Contagens por hora/direção e barras por hora, no mesmo commit do histórico
+            banco.somar_agregados(df_resumo, horario, ids)
+
+    for df_resumo, horario in itens:
+        TICKS.acrescentar(df_resumo, horario, ids)
+        ESTATISTICAS.atualizar_resumo(df_resumo, ids, horario)
+        JANELA.atualizar_resumo(df_resumo, ids, horario)
+    ESTATISTICAS.salvar(ARQUIVO_ESTATISTICAS)
+
+def carregar_estatisticas():
+    """Estado salvo das estatísticas online (ou um novo, na primeira vez)"""
+    if ARQUIVO_ESTATISTICAS.exists():
+        try:
+            return estatisticas.EstatisticasOnline.carregar(ARQUIVO_ESTATISTICAS)
+        except Exception as e:
+            print(f"Erro ao carregar estatísticas, começando do zero: {e}")
+    return estatisticas.EstatisticasOnline()
 
-    path = Path(__file__).parent.parent.parent
-    nome_arquivo = path /'banco'/ 'arquivos' / 'dado-do-dia' / f'{data}.json'
+def indicadores_ao_vivo():
+    """Indicadores atuais de cada ticker (média, desvio, EMAs, máxima/mínima e VWAP do dia)"""
+    df = ESTATISTICAS.indicadores()
+    nomes = {id_: ticker for ticker, id_ in classBanco.BaDa().ids_ativos().items()}
+    return df.set_axis(df.index.map(nomes).rename("Ativo"))
 
-    arquivo.to_json(
-        nome_arquivo, 
-        orient="records",   # Cria uma lista de objetos 
-        indent=4,           # Deixa o JSON legível 
-        force_ascii=False   # Permite acentos 
-    )
-    
+def sinais_ao_vivo(**parametros):
+    """Padrões (sequências, reversões, rompimentos, gaps) que o último refresh de cada ticker completou"""
+    nomes = {id_: ticker for ticker, id_ in classBanco.BaDa().ids_ativos().items()}
+    return JANELA.varrer(nomes, **parametros)
+
+# Média, variância, EMAs e VWAP de cada ticker, atualizados a cada refresh gravado
+ARQUIVO_ESTATISTICAS = Path(__file__).parent.parent.parent / 'banco' / 'data' / 'estatisticas.npz'
+ESTATISTICAS = carregar_estatisticas()
+
+# Últimas cotações de cada ticker, varridas em busca de padrões a cada refresh
+JANELA = varredura.JanelaRecente()
+
+# Snapshots JSON por data, com manifesto por dia
+SNAPSHOTS = classSnapshots.Snapshots()
+
+# Log binário do intradiário (banco/arquivos/ticks), para reler rápido na análise
+TICKS = classTicks.Ticks()
+
+# Toda gravação passa por esta thread única, em vez de uma thread nova por refresh
+GRAVADOR = gravador.Gravador(gravar_refreshes)
+
+def persistir(df_resumo, horario=None):
+    """Agenda a gravação de um refresh (snapshot JSON e histórico na tabela cotacoes)"""
+    if len(df_resumo) == 0:
+        return
+
+    GRAVADOR.enviar((df_resumo, horario or pd.Timestamp.now()))
+
+def salvar_dados(arquivo, horario=None):
+    """Grava o snapshot em banco/arquivos/dado-do-dia/AAAA/MM/DD/HHMMSS.json (e no manifesto do dia)"""
+    nome_arquivo = SNAPSHOTS.salvar(arquivo, horario or pd.Timestamp.now())
     print(f"\nArquivo salvo com sucesso em: {os.path.abspath(nome_arquivo)}")
 
 
@@ -0,0 +1,110 @@
+import atexit
+import queue
+import threading
+import time
+
+
+class Gravador:
+    """Uma única thread que grava em segundo plano o que chega numa fila limitada
+
+    Quem chama enviar() só enfileira e volta. A thread junta o que estiver na fila
+    (até `lote_maximo` itens) e grava tudo de uma vez com gravar_lote(itens), então
+    vários refreshes seguidos viram uma única transação. Se o disco ficar para trás e a
+    fila encher, enviar() espera abrir vaga (contrapressão) em vez de acumular memória.
+    No fim do programa a fila é esvaziada antes de sair.
+    """
+
+    FIM = object() # Marca na fila para a thread terminar
+
+    def __init__(self, gravar_lote, maximo_fila=32, lote_maximo=16, espera_lote=0.2):
+        self.gravar_lote = gravar_lote
+        self.fila = queue.Queue(maxsize=maximo_fila)
+        self.lote_maximo = lote_maximo
+        self.espera_lote = espera_lote # Segundos esperando mais itens para o mesmo lote
+        self.thread = None
+        self.trava = threading.Lock()
+        self.gravados = 0
+        self.lotes = 0
+        self.tempo = 0.0
+        self.erros = 0
+        atexit.register(self.fechar)
+
+    def iniciar(self):
+        with self.trava:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.rodar, daemon=True)
+                self.thread.start()
+
+    def enviar(self, item, timeout=None):
+        """Enfileira um item; com a fila cheia espera até timeout (None = o quanto precisar)
+
+        Devolve False se não coube na fila dentro do timeout.
+        """
+        self.iniciar()
+        try:
+            self.fila.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            print("Fila de gravação cheia: item descartado")
+            return False
+
+    def juntar_lote(self, primeiro):
+        """O primeiro item e mais o que chegar logo depois, até lote_maximo"""
+        lote = [primeiro]
+        limite = time.monotonic() + self.espera_lote
+
+        while len(lote) < self.lote_maximo:
+            restante = limite - time.monotonic()
+            try:
+                item = self.fila.get(timeout=max(restante, 0)) if restante > 0 else self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is self.FIM:
+                # Devolve a marca para o loop principal terminar depois deste lote
+                self.fila.task_done()
+                return lote, True
+            lote.append(item)
+
+        return lote, False
+
+    def rodar(self):
+        terminar = False
+        while not terminar:
+            primeiro = self.fila.get()
+            if primeiro is self.FIM:
+                self.fila.task_done()
+                break
+
+            lote, terminar = self.juntar_lote(primeiro)
+
+            inicio = time.perf_counter()
+            try:
+                self.gravar_lote(lote)
+                self.gravados += len(lote)
+                self.lotes += 1
+            except Exception as e:
+                self.erros += 1
+                print(f"Erro na gravação de {len(lote)} itens: {e}")
+            self.tempo += time.perf_counter() - inicio
+
+            for _ in lote:
+                self.fila.task_done()
+
+    def esvaziar(self):
+        """Espera tudo o que já foi enviado ser gravado"""
+        if self.thread is not None and self.thread.is_alive():
+            self.fila.join()
+
+    def fechar(self, timeout=30):
+        """Grava o que falta na fila e para a thread"""
+        with self.trava:
+            thread = self.thread
+        if thread is None or not thread.is_alive():
+            return
+
+        self.fila.put(self.FIM)
+        thread.join(timeout)
+
+        if self.lotes:
+            print(f"Gravador: {self.gravados} itens em {self.lotes} lotes, "
+                  f"{self.tempo / self.lotes * 1000:.1f} ms por lote")
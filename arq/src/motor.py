@@ -0,0 +1,237 @@
+import asyncio
+import threading
+
+import httpx
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent / 'banco' / 'connection'))
+import classBarras
+import classBanco
+import baixador
+import cache
+import resumo
+
+# Página -> [classe do bloco de notícias, tag de cada manchete]
+FONTES_NOTICIAS = {
+    "https://investnews.com.br/economia/page/540/?_gl=1%2Ali6itt%2Agclid%2AQ2p3S0NBanctYi1rQmhCLUVpd0E0ZnZLckVuMS1NV1lpRWswLTJWalpSbURoX2tGTU43b3dWQXpKNE1tc3V0SnBMZkhKN3FzNXRESm1Cb0NELXNRQXZEX0J3RQ..%2A_gcl_aw%2AR0NMLjE2ODcyODU1NzIuQ2p3S0NBanctYi1rQmhCLUVpd0E0ZnZLckVuMS1NV1lpRWswLTJWalpSbURoX2tGTU43b3dWQXpKNE1tc3V0SnBMZkhKN3FzNXRESm1Cb0NELXNRQXZEX0J3RQ..&noamp=mobile&gad_source=1&gad_campaignid=17459268635&gclid=CjwKCAiAqKbMBhBmEiwAZ3UboPjtNpeA1nAIdZIkw3sKxjCBLdy0mo8WZ4oz3Hjq9ft6ih084H4oeRoC_ncQAvD_BwE": ["category-posts-content","h2"],
+    "https://g1.globo.com/economia/" : ["column areatemplate-esquerda large-15 large-offset-0 xlarge-14 xlarge-offset-1 float-left","h2"],
+    "https://www.infomoney.com.br/economia/" : ["max-w-9xl mx-auto","h2"],
+    "https://www.cnnbrasil.com.br/economia/": ["grid lg:grid-cols-3 lg:gap-8 lg:border-t lg:border-neutral-300 lg:py-0 lg:pb-8 lg:pt-8 lg:*:py-0","h2"],
+    "https://g1.globo.com/politica/": ["theme","h2"],
+    "https://www.cnnbrasil.com.br/politica/": ["lg:mt-2","h3"],
+    "https://noticias.uol.com.br/politica/": ["flex-wrap ","h3"],
+    "https://jovempan.com.br/noticias/politica": ["main col-md-8","h2"]
+}
+
+
+def extrair_manchetes(html, classe, tag):
+    """{título: link} das manchetes de uma página"""
+    soup = BeautifulSoup(html, 'html.parser')
+    bloco = soup.find(class_=classe)
+    if bloco is None:
+        return {}
+
+    manchetes = {}
+    for news in bloco.find_all(tag):
+        link = news.find('a')
+        if link is not None and link.get('href'):
+            manchetes[news.text.strip()] = link.attrs['href']
+    return manchetes
+
+
+class MotorAsync:
+    """Busca cotações e notícias num único loop asyncio, com limite de requisições
+
+    As páginas de notícias (httpx) dividem um semáforo de `limite` requisições. O yfinance
+    não é assíncrono, então cada lote de cotações roda em asyncio.to_thread, com um limite
+    próprio: o do provedor (Baixador.paralelos), que é um lote por vez no Yahoo, porque o
+    yf.download não pode rodar duas vezes ao mesmo tempo.
+    """
+
+    def __init__(self, limite=8, baixador_lotes=None, barras=None, cache_cotacoes=None,
+                 fontes=None, timeout=15, intervalo="1d"):
+        self.limite = limite
+        self.baixador = baixador_lotes if baixador_lotes is not None else baixador.Baixador()
+        self.barras = barras
+        self.cache = cache_cotacoes if cache_cotacoes is not None else cache.CACHE
+        self.fontes = fontes if fontes is not None else FONTES_NOTICIAS
+        self.timeout = timeout
+        self.intervalo = intervalo
+        self.semaforo = None
+        self.semaforo_cotacoes = None
+
+    def limitar(self):
+        # Criado sob demanda para ficar preso ao loop que realmente roda as tarefas
+        if self.semaforo is None:
+            self.semaforo = asyncio.Semaphore(self.limite)
+        return self.semaforo
+
+    def limitar_cotacoes(self):
+        if self.semaforo_cotacoes is None:
+            self.semaforo_cotacoes = asyncio.Semaphore(min(self.limite, self.baixador.paralelos()))
+        return self.semaforo_cotacoes
+
+    # ================================= NOTÍCIAS =================================
+
+    async def buscar_pagina(self, cliente, link, classe, tag):
+        try:
+            async with self.limitar():
+                resposta = await cliente.get(link)
+            return extrair_manchetes(resposta.content, classe, tag)
+        except Exception as e:
+            print(f'Erro no {link}: {e}')
+            return {}
+
+    async def buscar_noticias(self, ao_concluir=None):
+        """Busca todas as fontes ao mesmo tempo e devolve {título: link}"""
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as cliente:
+            paginas = await asyncio.gather(*[
+                self.buscar_pagina(cliente, link, classe, tag)
+                for link, (classe, tag) in self.fontes.items()
+            ])
+
+        noticias = {}
+        for manchetes in paginas:
+            noticias.update(manchetes)
+
+        if ao_concluir is not None:
+            ao_concluir(noticias)
+        return noticias
+
+    # ================================= COTAÇÕES =================================
+
+    async def buscar_lote(self, lote, argumentos):
+        """Baixa um lote (repetindo se falhar) e devolve (lote, dados), com dados None se desistir
+
+        Se a última tentativa voltou sem cotação (LoteVazio), dados é um DataFrame vazio.
+        """
+        erro = None
+        for tentativa in range(1, self.baixador.tentativas + 1):
+            # Espera antes de repetir fora do semáforo, para não segurar vaga de ninguém
+            await asyncio.sleep(self.baixador.espera * (tentativa - 1))
+            try:
+                async with self.limitar_cotacoes():
+                    dados, tempo = await asyncio.to_thread(self.baixador.baixar_lote, lote, 1, **argumentos)
+            except Exception as e:
+                print(f"Lote {lote[0]}.. falhou ({e}), tentativa {tentativa}/{self.baixador.tentativas}")
+                erro = e
+                continue
+
+            print(f"Lote {lote[0]}..: {len(lote)} tickers em {tempo:.2f}s")
+            self.baixador.ajustar_tamanho(tempo, len(lote))
+            return lote, dados
+
+        self.baixador.falhas.extend(lote)
+        return lote, pd.DataFrame() if isinstance(erro, baixador.LoteVazio) else None
+
+    async def buscar_cotacoes(self, tickers_formatados, ao_lote=None):
+        """Baixa todos os tickers em lotes concorrentes e devolve o resumo numérico
+
+        ao_lote(df_lote, concluidos, total) é chamado a cada lote pronto, na thread do loop.
+        """
+        barras = self.barras if self.barras is not None else classBarras.Barras()
+        banco = classBanco.BaDa()
+        total = len(tickers_formatados)
+        partes = []
+        respostas = []
+
+        def entregar(df_lote, concluidos):
+            partes.append(df_lote)
+            if ao_lote is not None:
+                ao_lote(df_lote, concluidos, total)
+
+        prontos, meus, alheios = self.cache.reservar([(t, self.intervalo) for t in tickers_formatados])
+        concluidos = len(prontos)
+        if prontos:
+            entregar(resumo.resumo_de_linhas(prontos.values()), concluidos)
+
+        try:
+            pendentes = [t for t, _ in meus]
+            grupos = await asyncio.to_thread(barras.grupos_de_download, pendentes)
+
+            tarefas = []
+            for grupo, argumentos in grupos:
+                tamanho = self.baixador.tamanho_lote
+                for i in range(0, len(grupo), tamanho):
+                    tarefas.append(self.buscar_lote(grupo[i:i + tamanho], argumentos))
+
+            for tarefa in asyncio.as_completed(tarefas):
+                lote, dados = await tarefa
+
+                df_lote = resumo.resumo_vazio()
+                if dados is not None:
+                    await asyncio.to_thread(barras.salvar, dados, lote)
+                    respostas.append((lote, resumo.tickers_com_dados(dados, lote)))
+                    carregado = await asyncio.to_thread(barras.carregar, lote, 2)
+                    df_lote = resumo.resumir_cotacoes(carregado, lote)
+
+                valores = {(t, self.intervalo): linha for t, linha in resumo.linhas_por_ticker(df_lote).items()}
+                self.cache.liberar([(t, self.intervalo) for t in lote], valores)
+
+                concluidos += len(lote)
+                entregar(df_lote, concluidos)
+        finally:
+            self.cache.liberar(meus)
+
+        # Quarentena só com a busca inteira: se tudo voltou vazio foi a rede, não os tickers
+        await asyncio.to_thread(banco.registrar_busca, respostas)
+
+        if alheios:
+            valores = await asyncio.to_thread(self.cache.esperar, alheios)
+            entregar(resumo.resumo_de_linhas(valores.values()), total)
+
+        if not partes:
+            return resumo.resumo_vazio()
+
+        df_final = pd.concat(partes, ignore_index=True)
+        df_final["Status"] = pd.Categorical(df_final["Status"], categories=resumo.STATUS)
+        return df_final
+
+    async def atualizar(self, tickers_formatados, ao_lote=None, ao_noticias=None):
+        """Cotações e notícias ao mesmo tempo; devolve (resumo, noticias)"""
+        return await asyncio.gather(
+            self.buscar_cotacoes(tickers_formatados, ao_lote),
+            self.buscar_noticias(ao_noticias),
+        )
+
+
+class Ponte:
+    """Roda um loop asyncio numa thread própria e entrega os resultados para o Tkinter
+
+    O Tk só pode ser mexido pela thread principal, então todo callback passa pelo root.after.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def no_tk(self, funcao):
+        """Envolve uma função para ela rodar na thread do Tk, de onde quer que seja chamada"""
+        def chamar(*args):
+            self.root.after(0, funcao, *args)
+        return chamar
+
+    def enviar(self, corrotina, ao_concluir=None, ao_falhar=None):
+        """Agenda a corrotina no loop; ao_concluir(resultado) e ao_falhar(erro) rodam no Tk"""
+        futuro = asyncio.run_coroutine_threadsafe(corrotina, self.loop)
+
+        def terminar(f):
+            erro = f.exception()
+            if erro is not None:
+                print(f"Erro => {erro}")
+                if ao_falhar is not None:
+                    self.root.after(0, ao_falhar, erro)
+            elif ao_concluir is not None:
+                self.root.after(0, ao_concluir, f.result())
+
+        futuro.add_done_callback(terminar)
+        return futuro
+
+    def fechar(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
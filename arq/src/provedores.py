@@ -0,0 +1,130 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Mesmos campos, na mesma ordem, que o yf.download devolve
+CAMPOS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class Provedor(ABC):
+    """Interface de quem fornece cotações no formato do yf.download (group_by='ticker')
+
+    Só provedores com SEGURO_ENTRE_THREADS podem ser chamados por várias threads ao mesmo
+    tempo; os outros são chamados um lote por vez (Baixador.paralelos).
+    """
+
+    SEGURO_ENTRE_THREADS = False
+
+    @abstractmethod
+    def baixar(self, tickers, period=None, start=None, timeout=None):
+        """DataFrame MultiIndex (ticker, campo) com os pregões pedidos (period ou start)"""
+
+
+# O yf.download guarda resultados e erros em dicionários globais (shared._DFS/_ERRORS) e
+# zera os dois no começo de cada chamada: duas chamadas juntas apagam ou misturam os lotes
+_TRAVA_YFINANCE = threading.Lock()
+
+
+class ProvedorYahoo(Provedor):
+    """Cotações reais via yfinance, uma chamada por vez (o paralelismo fica no threads=True)"""
+
+    def baixar(self, tickers, period=None, start=None, timeout=None):
+        # Importado aqui para o replay funcionar em máquina sem yfinance
+        import yfinance as yf
+
+        kwargs = {}
+        if period is not None:
+            kwargs["period"] = period
+        if start is not None:
+            kwargs["start"] = start
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        with _TRAVA_YFINANCE:
+            return yf.download(" ".join(tickers), group_by='ticker', threads=True, progress=False, **kwargs)
+
+
+class ProvedorReplay(Provedor):
+    """Devolve quadros gravados ou sintéticos no mesmo formato do Yahoo, sem rede
+
+    latencia é o tempo fixo de cada chamada e latencia_ticker o tempo extra por ticker,
+    para simular o custo de um download real. Os preços sintéticos dependem só do
+    ticker e da data, então o resultado é o mesmo qualquer que seja o tamanho do lote.
+    Os tickers de sem_dados voltam só com NaN, como o Yahoo faz com ticker que não existe mais.
+    """
+
+    SEGURO_ENTRE_THREADS = True
+
+    def __init__(self, arquivo=None, latencia=0.0, latencia_ticker=0.0, pregoes=2, fim=None, sem_dados=()):
+        self.sem_dados = set(sem_dados)
+        self.latencia = latencia
+        self.latencia_ticker = latencia_ticker
+        self.pregoes = pregoes
+        self.fim = pd.Timestamp(fim) if fim is not None else pd.Timestamp.now().normalize()
+        self.gravado = pd.read_pickle(arquivo) if arquivo is not None else None
+
+    def sintetico(self, ticker, datas):
+        """Pregões determinísticos de um ticker (passeio aleatório com semente no nome)"""
+        gerador = np.random.default_rng(zlib.crc32(ticker.encode()))
+        base = gerador.uniform(5, 100)
+
+        # Sorteia desde o primeiro dia possível para a data N ser sempre o mesmo pregão
+        dias = (datas - pd.Timestamp("2000-01-01")).days.to_numpy()
+        total = dias.max() + 1 if len(dias) else 0
+
+        fechamento = (base * np.exp(np.cumsum(gerador.normal(0, 0.02, total))))[dias]
+        abertura = fechamento * (1 + gerador.normal(0, 0.005, total)[dias])
+        maxima = np.maximum(abertura, fechamento) * (1 + np.abs(gerador.normal(0, 0.005, total)[dias]))
+        minima = np.minimum(abertura, fechamento) * (1 - np.abs(gerador.normal(0, 0.005, total)[dias]))
+        volume = gerador.integers(1_000, 1_000_000, total)[dias].astype(float)
+
+        return np.column_stack([abertura, maxima, minima, fechamento, volume])
+
+    def baixar(self, tickers, period=None, start=None, timeout=None):
+        time.sleep(self.latencia + self.latencia_ticker * len(tickers))
+
+        if self.gravado is not None:
+            colunas = pd.MultiIndex.from_product([tickers, CAMPOS])
+            dados = self.gravado.reindex(columns=colunas)
+            mortos = [t for t in tickers if t in self.sem_dados]
+            if mortos:
+                dados.loc[:, mortos] = np.nan
+            if start is not None:
+                dados = dados[dados.index >= pd.Timestamp(start)]
+            return dados
+
+        # Dias úteis até o fim, a partir do start ou só os N últimos pregões
+        if start is not None:
+            datas = pd.bdate_range(pd.Timestamp(start), self.fim)
+        else:
+            pregoes = int(period[:-1]) if period and period.endswith("d") else self.pregoes
+            datas = pd.bdate_range(end=self.fim, periods=pregoes)
+
+        colunas = pd.MultiIndex.from_product([tickers, CAMPOS])
+        valores = np.hstack([np.full((len(datas), len(CAMPOS)), np.nan) if t in self.sem_dados
+                             else self.sintetico(t, datas) for t in tickers]) if tickers else None
+        return pd.DataFrame(valores, index=datas, columns=colunas)
+
+
+def gravar(dados, arquivo):
+    """Grava um quadro do yf.download para ser servido depois pelo ProvedorReplay"""
+    Path(arquivo).parent.mkdir(parents=True, exist_ok=True)
+    dados.to_pickle(arquivo)
+
+
+def padrao():
+    """Provedor escolhido pela variável INVEST_PROVEDOR (yahoo ou replay)"""
+    nome = os.environ.get("INVEST_PROVEDOR", "yahoo")
+
+    if nome == "replay":
+        return ProvedorReplay(
+            arquivo=os.environ.get("INVEST_REPLAY_ARQUIVO"),
+            latencia=float(os.environ.get("INVEST_REPLAY_LATENCIA", 0)),
+        )
+    return ProvedorYahoo()
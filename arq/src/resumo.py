@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+# Ordem fixa das categorias de status
+STATUS = ["Alta", "Baixa", "Neutro"]
+
+COLUNAS_RESUMO = ["Ativo", "Preço", "Anterior", "Var R$", "Var %", "Status", "Volume"]
+
+
+def formatar_tickers(lista_tickers):
+    """Acrescenta o sufixo .SA (B3) aos tickers que ainda não têm"""
+    return [t + ".SA" if not t.endswith(".SA") else t for t in lista_tickers]
+
+
+def tickers_com_dados(dados, tickers_formatados):
+    """Quais tickers voltaram com pelo menos um fechamento no DataFrame do yf.download"""
+    if dados is None or dados.empty:
+        return []
+
+    if not isinstance(dados.columns, pd.MultiIndex):
+        return list(tickers_formatados[:1]) if dados["Close"].notna().any() else []
+
+    fechamento = dados.xs("Close", axis=1, level=1)
+    com_dados = fechamento.columns[fechamento.notna().any().to_numpy()]
+    return [t for t in tickers_formatados if t in set(com_dados)]
+
+
+def resumo_vazio():
+    """DataFrame de resumo sem linhas, mas com as colunas e tipos certos"""
+    return pd.DataFrame({
+        "Ativo": pd.Series(dtype=object),
+        "Preço": pd.Series(dtype=float),
+        "Anterior": pd.Series(dtype=float),
+        "Var R$": pd.Series(dtype=float),
+        "Var %": pd.Series(dtype=float),
+        "Status": pd.Categorical([], categories=STATUS),
+        "Volume": pd.Series(dtype=float),
+    })
+
+
+def resumo_de_linhas(linhas):
+    """Monta o DataFrame de resumo a partir de uma lista de linhas (dicts) já calculadas"""
+    if not linhas:
+        return resumo_vazio()
+
+    resultado = pd.DataFrame(list(linhas), columns=COLUNAS_RESUMO)
+    resultado["Status"] = pd.Categorical(resultado["Status"], categories=STATUS)
+    return resultado
+
+
+def linhas_por_ticker(resumo):
+    """{ticker com .SA: linha (dict)} de um resumo, para guardar no cache"""
+    return dict(zip(formatar_tickers(resumo["Ativo"]), resumo.to_dict("records")))
+
+
+def resumir_cotacoes(dados, tickers_formatados=None):
+    """Calcula preço atual, fechamento anterior, variação e status de todos os ativos de uma vez
+
+    Recebe o DataFrame MultiIndex (ticker, campo) que o yf.download devolve com
+    group_by='ticker' e devolve um DataFrame com colunas numéricas, uma linha por ativo.
+    Sem tickers_formatados, resume todos os tickers presentes em dados.
+    """
+    if dados is None or dados.empty:
+        return resumo_vazio()
+
+    # Com um único ticker o yf.download pode devolver colunas sem o nível do ticker;
+    # aí só quem chamou sabe de qual ticker são as colunas
+    if not isinstance(dados.columns, pd.MultiIndex):
+        if not tickers_formatados:
+            raise ValueError("resumir_cotacoes: colunas sem o nível do ticker exigem tickers_formatados")
+        dados = pd.concat({tickers_formatados[0]: dados}, axis=1)
+
+    presentes = dados.columns.get_level_values(0).unique()
+    if tickers_formatados is None:
+        tickers_formatados = list(presentes)
+
+    faltando = [t for t in tickers_formatados if t not in presentes]
+    if faltando:
+        print(f"Erro: Dados não encontrados para {', '.join(faltando)}")
+
+    tickers = [t for t in tickers_formatados if t in presentes]
+    if not tickers:
+        return resumo_vazio()
+
+    campos = dados.columns.get_level_values(1).unique()
+
+    # Cubo (tempo x ticker x campo) para trabalhar tudo em NumPy
+    grade = pd.MultiIndex.from_product([tickers, campos])
+    valores = dados.reindex(columns=grade).to_numpy(dtype=float)
+    valores = valores.reshape(len(dados), len(tickers), len(campos))
+
+    # Linha válida = nenhum campo vazio (o mesmo que o dropna() por ticker)
+    validos = ~np.isnan(valores).any(axis=2)
+    fechamento = valores[:, :, campos.get_loc("Close")]
+
+    # Posição da última e da penúltima linha válida de cada ticker (-1 = não existe)
+    posicoes = np.where(validos, np.arange(len(dados))[:, None], -1)
+    ultima = posicoes.max(axis=0)
+    penultima = np.where(posicoes < ultima, posicoes, -1).max(axis=0)
+
+    colunas = np.arange(len(tickers))
+    preco = fechamento[ultima, colunas]
+    anterior = np.where(penultima >= 0, fechamento[penultima, colunas], preco)
+
+    # Quem só tem um pregão fica com variação zero
+    var_reais = preco - anterior
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var_pct = np.where(anterior != 0, var_reais / anterior * 100, 0.0)
+
+    status = np.select([var_reais > 0, var_reais < 0], ["Alta", "Baixa"], "Neutro")
+
+    # Volume acumulado do último pregão (NaN se o provedor não mandar)
+    if "Volume" in campos:
+        volume = valores[ultima, colunas, campos.get_loc("Volume")]
+    else:
+        volume = np.full(len(tickers), np.nan)
+
+    # Descarta quem não tem nenhuma linha válida
+    tem_dados = ultima >= 0
+
+    resultado = pd.DataFrame({
+        "Ativo": pd.Index(tickers).str.replace(".SA", "", regex=False)[tem_dados],
+        "Preço": preco[tem_dados],
+        "Anterior": anterior[tem_dados],
+        "Var R$": var_reais[tem_dados],
+        "Var %": var_pct[tem_dados],
+        "Status": pd.Categorical(status[tem_dados], categories=STATUS),
+        "Volume": volume[tem_dados],
+    })
+    return resultado
+
+
+def registros_snapshot(resumo, horario):
+    """Resumo numérico pronto para o snapshot JSON: números como números e o horário do refresh"""
+    snapshot = resumo.copy()
+    snapshot["Status"] = snapshot["Status"].astype(str)
+    snapshot["Horario"] = pd.Timestamp(horario).strftime('%Y-%m-%dT%H:%M:%S')
+    return snapshot
+
+
+def formatar_resumo(resumo):
+    """Converte o resumo numérico nas strings de exibição ("R$ 12.34", "+0.50", "+1.20%")
+
+    Só a tela (Treeview / terminal) deve chamar isto: o resto do programa usa os números.
+    """
+    return pd.DataFrame({
+        "Ativo": resumo["Ativo"],
+        "Preço": resumo["Preço"].map("R$ {:.2f}".format),
+        "Var R$": resumo["Var R$"].map("{:+.2f}".format),
+        "Var %": resumo["Var %"].map("{:+.2f}%".format),
+        "Status": resumo["Status"].astype(str),
+    })
@@ -1,86 +1,118 @@
+import argparse
+import hashlib
 import sqlite3
 from pathlib import Path
 import pandas as pd
 
+# Configuração de Caminhos
+BASE_DIR = Path(__file__).parent.parent.parent.resolve() # pasta banco
+ARQUIVO_DB = BASE_DIR / "data" / "Investimento.db"
+CSV_ATIVOS = BASE_DIR / "arquivos" / "lista_tickers" / "ativos.csv"
+CSV_NEGRA = BASE_DIR / "arquivos" / "lista_tickers" / "lista-negra.csv"
+
+# Chave na tabela metadados com o hash dos CSVs da última sincronização
+CHAVE_HASH = "hash_lista_tickers"
 
-def migrar_dados():
-    try:
-        # Configuração de Caminhos
-        BASE_DIR = Path(__file__).parent.parent.parent.resolve() 
-        ARQUIVO_DB = BASE_DIR / "data" / "Investimento.db"
-        CSV_ATIVOS = BASE_DIR / "esquemas" / "lista_tickers" / "ativos.csv"
-        CSV_NEGRA = BASE_DIR / "esquemas" / "lista_tickers" / "lista-negra.csv"
-
-        # Garantir que a pasta do banco existe
-        ARQUIVO_DB.parent.mkdir(parents=True, exist_ok=True)
-    except:
-        print("Erro ao carregar caminho dos arquivos")
-     
-    # Carregar Arquivos
-    try:
-        df = pd.read_csv(CSV_ATIVOS)
 
-        # Se o arquivo não existir, cria lista vazia para não quebrar
-        lista_negra = []
-        if CSV_NEGRA.exists():
-            df_negra = pd.read_csv(CSV_NEGRA)
-            lista_negra = df_negra['id'].tolist() # Mais rápido que list(df['id'])
-            #print(f"Lista negra carregada com {len(lista_negra)} itens.")
-    except Exception as e:
-        print(f"Erro crítico ao ler arquivos: {e}")
-        return
+def hash_dos_arquivos(*arquivos):
+    """sha256 do conteúdo dos arquivos (os que não existem contam como vazios)"""
+    h = hashlib.sha256()
+    for arquivo in arquivos:
+        h.update(arquivo.name.encode())
+        if arquivo.exists():
+            h.update(arquivo.read_bytes())
+    return h.hexdigest()
 
-    # Filtro 
-    #qtd_inicial = len(df)
+def carregar_lista():
+    """{ticker: nome} do ativos.csv, sem quem está na lista negra"""
+    df = pd.read_csv(CSV_ATIVOS)
+
+    # Se o arquivo não existir, cria lista vazia para não quebrar
+    lista_negra = []
+    if CSV_NEGRA.exists():
+        df_negra = pd.read_csv(CSV_NEGRA)
+        lista_negra = df_negra['id'].tolist() # Mais rápido que list(df['id'])
 
     # Remove quem está na lista negra
-    df_limpo = df[ ~df['id'].isin(lista_negra) ].copy()
-    
-    # print(f"Total inicial: {qtd_inicial}")
-    # print(f"Removidos: {qtd_inicial - len(df_limpo)}")
-    # print(f"Total a salvar: {len(df_limpo)}")
-
-    # Vamos criar a lista de tuplas para o banco.
-    dados_para_inserir = []
-    
-    for row in df_limpo.itertuples(index=False):
-        ticker = row.id
-        nome_empresa = str(row.Nome).replace("SAD", "").strip() # Limpeza e segurança
-        
-        # Guardamos apenas. O ID é com o banco.
-        dados_para_inserir.append((ticker, nome_empresa))
-
-    # Banco de Dados
+    df_limpo = df[ ~df['id'].isin(lista_negra) ]
+
+    # Limpeza e segurança. O ID é com o banco.
+    return {row.id: str(row.Nome).replace("SAD", "").strip() for row in df_limpo.itertuples(index=False)}
+
+def calcular_diferencas(atual, desejado):
+    """atual: {ticker: (id, nome)} do banco; desejado: {ticker: nome} dos CSVs
+
+    Devolve (inserir [(ticker, nome)], atualizar [(nome, id)], remover [id])
+    """
+    inserir = [(ticker, nome) for ticker, nome in desejado.items() if ticker not in atual]
+    atualizar = [(desejado[ticker], id_) for ticker, (id_, nome) in atual.items()
+                 if ticker in desejado and desejado[ticker] != nome]
+    remover = [id_ for ticker, (id_, _) in atual.items() if ticker not in desejado]
+    return inserir, atualizar, remover
+
+def migrar_dados(forcar=False):
+    """Sincroniza a tabela ativos com os CSVs, sem trocar o id de quem já existe
+
+    O histórico (tabela cotacoes) é ligado pelo ativos.id, então nada de apagar tudo e
+    inserir de novo: só entra quem é novo, só muda o nome de quem mudou e só sai quem
+    saiu da lista. Se os CSVs não mudaram desde a última vez, não faz nada.
+    """
+    # Garantir que a pasta do banco existe
+    ARQUIVO_DB.parent.mkdir(parents=True, exist_ok=True)
+
+    hash_atual = hash_dos_arquivos(CSV_ATIVOS, CSV_NEGRA)
+
+    con = sqlite3.connect(ARQUIVO_DB)
     try:
-        con = sqlite3.connect(ARQUIVO_DB)
-        cur = con.cursor()
-        
-        # SE NÃO EXISTIR cria a tabela 
-        # cria um id automatico
-        cur.execute("""
+        # SE NÃO EXISTIR cria as tabelas
+        # AUTOINCREMENT: o id de um ticker removido nunca é reaproveitado por outro
+        con.execute("""
             CREATE TABLE IF NOT EXISTS ativos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, 
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
                 ticker TEXT UNIQUE,
                 nome TEXT
             )
         """)
-        
-        # Limpa a tabela antes de inserir 
-        print("Limpando banco antigo...")
-        cur.execute("DELETE FROM ativos")
-        cur.execute("DELETE FROM sqlite_sequence WHERE name='ativos'")
-        con.commit() # Importante commitar a limpeza antes de inserir
-        
-        # INSERT IGNORE ou INSERT OR REPLACE evita erro se já existir o ticker
-        cur.executemany("INSERT OR REPLACE INTO ativos (ticker, nome) VALUES (?, ?)", dados_para_inserir)
-        
-        con.commit()
-        print("Migração concluída com Sucesso!")
-        
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS metadados (
+                chave TEXT PRIMARY KEY,
+                valor TEXT
+            )
+        """)
+
+        linha = con.execute("SELECT valor FROM metadados WHERE chave = ?", (CHAVE_HASH,)).fetchone()
+        if not forcar and linha is not None and linha[0] == hash_atual:
+            print("Lista de tickers sem mudanças. Nada a fazer.")
+            return
+
+        try:
+            desejado = carregar_lista()
+        except Exception as e:
+            print(f"Erro crítico ao ler arquivos: {e}")
+            return
+
+        atual = {ticker: (id_, nome) for id_, ticker, nome in con.execute("SELECT id, ticker, nome FROM ativos")}
+        inserir, atualizar, remover = calcular_diferencas(atual, desejado)
+
+        # Tudo numa transação só: ou a tabela fica igual aos CSVs, ou fica como estava
+        with con:
+            con.executemany("INSERT INTO ativos (ticker, nome) VALUES (?, ?)", inserir)
+            con.executemany("UPDATE ativos SET nome = ? WHERE id = ?", atualizar)
+            # O histórico de quem sai fica guardado com o id antigo
+            con.executemany("DELETE FROM ativos WHERE id = ?", [(id_,) for id_ in remover])
+            con.execute("INSERT OR REPLACE INTO metadados (chave, valor) VALUES (?, ?)", (CHAVE_HASH, hash_atual))
+
+        print(f"Migração concluída com Sucesso! {len(inserir)} novos, "
+              f"{len(atualizar)} atualizados, {len(remover)} removidos")
+
     except sqlite3.Error as e:
         print(f"Erro de Banco de Dados: {e}")
     finally:
         con.close()
 
 if __name__ == "__main__":
-    migrar_dados()
+    parser = argparse.ArgumentParser(description="Sincroniza a tabela ativos com ativos.csv e lista-negra.csv")
+    parser.add_argument("--forcar", action="store_true", help="sincroniza mesmo se os CSVs não mudaram")
+    args = parser.parse_args()
+
+    migrar_dados(args.forcar)
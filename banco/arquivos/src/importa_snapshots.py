@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent / 'connection'))
+import classBanco
+import classSnapshots
+
+# Importa os snapshots antigos para a tabela cotacoes:
+#   JSON do funcoes.salvar_dados: Ativo, Preço, Var R$, Var %, Status, Horario (números), em AAAA/MM/DD/HHMMSS.json
+#                                 ou, nos arquivos antigos, "R$ 12.34", "+0.12", "+1.23%" sem Horario
+#                                 (o horário sai do nome %Hh-%Mm-%Ss_-_%d-%m)
+#   CSV do legado.salvar_dados:   id,preco,variacao,porcento,horario, nome %H-%M-%S_-_%Y_%m_%d
+# Os arquivos são lidos em paralelo (um processo por núcleo) e gravados em lotes.
+# O manifesto guarda o que já entrou; rodar de novo só importa arquivos novos ou alterados.
+
+BASE_DIR = Path(__file__).parent.parent.parent.parent.resolve()
+PASTAS_PADRAO = [
+    BASE_DIR / 'banco' / 'arquivos' / 'dado-do-dia',
+    BASE_DIR / 'arq' / 'src' / 'dado-do-dia',
+]
+MANIFESTO = BASE_DIR / 'banco' / 'arquivos' / 'importacao.json'
+
+
+def numero(valor):
+    """'R$ 1.234,56', '+0.12', '(-1,5%)', 3.2 -> float (None se não der)"""
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+
+    texto = re.sub(r"[R$%()\s]", "", str(valor))
+    if "," in texto:
+        # Formato brasileiro: ponto separa milhar, vírgula separa decimal
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+def horario_json(caminho):
+    """Horário de um snapshot sem coluna Horario, pelo nome do arquivo"""
+    horario = classSnapshots.horario_do_caminho(caminho)
+    if horario is None:
+        raise ValueError(f"nome fora do padrão: {caminho.name}")
+    return horario
+
+def ler_json(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        registros = json.load(f)
+    if not registros:
+        return []
+
+    # Snapshots novos já trazem o horário em cada registro
+    horario = registros[0].get("Horario") or horario_json(caminho).strftime('%Y-%m-%dT%H:%M:%S')
+
+    return [(r.get("Ativo"), horario, numero(r.get("Preço")), numero(r.get("Var R$")), numero(r.get("Var %")))
+            for r in registros]
+
+def ler_csv(caminho):
+    horario = horario_json(caminho).strftime('%Y-%m-%dT%H:%M:%S')
+    df = pd.read_csv(caminho, dtype=str)
+
+    # O legado abre o arquivo em modo 'a' e escreve o cabeçalho de novo a cada gravação
+    df = df[df["id"] != "id"]
+
+    return [(ativo, horario, numero(preco), numero(variacao), numero(porcento))
+            for ativo, preco, variacao, porcento in zip(df["id"], df["preco"], df["variacao"], df["porcento"])]
+
+def ler_arquivo(caminho):
+    """Roda nos processos filhos: (caminho, linhas normalizadas, erro)"""
+    caminho = Path(caminho)
+    try:
+        leitor = ler_json if caminho.suffix == ".json" else ler_csv
+        linhas = [linha for linha in leitor(caminho) if linha[0] and linha[2] is not None]
+        return str(caminho), linhas, None
+    except Exception as e:
+        return str(caminho), [], str(e).splitlines()[0]
+
+
+def assinatura(caminho):
+    info = caminho.stat()
+    return [info.st_size, info.st_mtime_ns]
+
+def carregar_manifesto(arquivo):
+    if not arquivo.exists():
+        return {}
+    with open(arquivo, encoding="utf-8") as f:
+        return json.load(f)
+
+def salvar_manifesto(manifesto, arquivo):
+    # Grava num temporário e troca, para um Ctrl+C no meio não corromper o manifesto
+    temporario = arquivo.with_suffix(".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, arquivo)
+
+def descobrir(pastas, manifesto):
+    """Arquivos .json/.csv das pastas que ainda não estão no manifesto (ou mudaram)"""
+    pendentes = []
+    for pasta in pastas:
+        if not pasta.exists():
+            continue
+        for caminho in sorted(pasta.rglob("*")):
+            if caminho.suffix not in (".json", ".csv") or caminho.name == "manifesto.json":
+                continue
+            item = manifesto.get(str(caminho))
+            if item is None or item["assinatura"] != assinatura(caminho):
+                pendentes.append(caminho)
+    return pendentes
+
+
+def importar(pastas=None, manifesto_arquivo=MANIFESTO, processos=None, lote=200, banco=None):
+    """Importa os snapshots pendentes e devolve (arquivos importados, linhas inseridas)"""
+    pastas = [Path(p) for p in pastas] if pastas else PASTAS_PADRAO
+    banco = banco if banco is not None else classBanco.BaDa()
+
+    manifesto = carregar_manifesto(manifesto_arquivo)
+    pendentes = descobrir(pastas, manifesto)
+    print(f"{len(pendentes)} arquivos para importar")
+    if not pendentes:
+        return 0, 0
+
+    ids = banco.ids_ativos()
+    fora_da_lista = set()
+    arquivos = inseridas = 0
+    buffer, feitos = [], []
+
+    def gravar():
+        nonlocal inseridas
+        # Manifesto só muda depois do commit: se cair no meio, o lote é lido de novo
+        banco.inserir_cotacoes(buffer)
+        inseridas += len(buffer)
+        for caminho, n in feitos:
+            manifesto[caminho] = {"assinatura": assinatura(Path(caminho)), "linhas": n}
+        salvar_manifesto(manifesto, manifesto_arquivo)
+        buffer.clear()
+        feitos.clear()
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        for caminho, linhas, erro in executor.map(ler_arquivo, map(str, pendentes), chunksize=16):
+            if erro is not None:
+                print(f"Erro em {caminho}: {erro}")
+                continue
+
+            for ativo, horario, preco, var_reais, var_pct in linhas:
+                if ativo not in ids:
+                    fora_da_lista.add(ativo)
+                    continue
+                anterior = None if var_reais is None else round(preco - var_reais, 2)
+                buffer.append((ids[ativo], horario, preco, anterior, var_reais, var_pct))
+
+            feitos.append((caminho, len(linhas)))
+            arquivos += 1
+            if len(feitos) >= lote:
+                gravar()
+                print(f"{arquivos}/{len(pendentes)} arquivos")
+
+    if feitos:
+        gravar()
+
+    # O histórico antigo entra fora da ordem dos refreshes: os agregados por hora são refeitos
+    if inseridas:
+        banco.reconstruir_agregados()
+
+    if fora_da_lista:
+        print(f"{len(fora_da_lista)} tickers fora da tabela ativos foram ignorados")
+    print(f"Importação concluída: {arquivos} arquivos, {inseridas} linhas")
+    return arquivos, inseridas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa os snapshots JSON/CSV antigos para a tabela cotacoes")
+    parser.add_argument("pastas", nargs="*", type=Path, help="pastas com os snapshots (padrão: as dado-do-dia)")
+    parser.add_argument("--processos", type=int, default=None, help="processos de leitura (padrão: núcleos)")
+    parser.add_argument("--lote", type=int, default=200, help="arquivos por transação")
+    args = parser.parse_args()
+
+    importar(args.pastas, processos=args.processos, lote=args.lote)
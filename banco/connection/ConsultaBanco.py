@@ -1,17 +1,17 @@
-import sqlite3
 from pathlib import Path
 import pandas as pd
+import classBanco
 
 def consultar_banco (caminho_banco= None):
     if caminho_banco is None:
         path = Path(__file__).parent.parent.parent.resolve()
         caminho_banco = path / 'banco' / 'data' / 'Investimento.db'
         print(caminho_banco)
-    con = sqlite3.connect(caminho_banco)
+    # Reaproveita a conexão da thread em vez de abrir uma nova a cada consulta
+    con = classBanco.conexoes(caminho_banco).conexao()
     comando = "SELECT * FROM ativos"
 
     df_tabela = pd.read_sql_query(comando, con)
-    con.close()
 
     return df_tabela
 
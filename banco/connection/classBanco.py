@@ -1,33 +1,512 @@
 import sqlite3
+import threading
+import numpy as np
 import pandas as pd
+from contextlib import contextmanager
 from pathlib import Path
+from datetime import datetime, timedelta
+
+import movimento
+
+CAMINHO_PADRAO = (Path(__file__).parent.parent.resolve()) / 'data' / 'Investimento.db'
+
+
+class Conexoes:
+    """Uma conexão por thread para um arquivo de banco, configurada uma vez só
+
+    Abrir o sqlite e rodar os PRAGMAs a cada consulta custa mais que a própria consulta
+    quando as cotações são gravadas o tempo todo. Aqui cada thread reaproveita a sua conexão
+    (o sqlite não gosta de uma conexão usada por duas threads ao mesmo tempo), e as
+    conexões de threads que já terminaram são fechadas na próxima abertura.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",      # leitores não esperam quem está gravando
+        "PRAGMA synchronous=NORMAL",    # com WAL continua seguro contra corrupção, e bem mais rápido
+        "PRAGMA mmap_size=268435456",   # lê o arquivo por memória mapeada (até 256 MB)
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA foreign_keys=ON",
+    )
+
+    def __init__(self, path, cache_comandos=128, timeout=30):
+        self.path = path
+        self.cache_comandos = cache_comandos # Comandos preparados guardados por conexão
+        self.timeout = timeout # Segundos esperando outro processo largar o banco
+        self.local = threading.local()
+        self.abertas = {} # ident da thread -> conexão
+        self.trava = threading.Lock()
+
+    def abrir(self):
+        con = sqlite3.connect(self.path, timeout=self.timeout,
+                              cached_statements=self.cache_comandos, check_same_thread=False)
+        for pragma in self.PRAGMAS:
+            con.execute(pragma)
+        return con
+
+    def conexao(self):
+        """Conexão da thread atual (criada na primeira vez)"""
+        con = getattr(self.local, "con", None)
+        if con is None:
+            con = self.abrir()
+            self.local.con = con
+            with self.trava:
+                self.fechar_orfas()
+                # O Python reaproveita o ident de uma thread que já terminou: se ela deixou
+                # conexão, fecha antes de trocar (senão fica aberta segurando um leitor do WAL)
+                antiga = self.abertas.pop(threading.get_ident(), None)
+                if antiga is not None:
+                    antiga.close()
+                self.abertas[threading.get_ident()] = con
+        return con
+
+    def fechar_orfas(self):
+        vivas = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self.abertas if i not in vivas]:
+            self.abertas.pop(ident).close()
+
+    @contextmanager
+    def transacao(self):
+        """Bloco com commit no fim ou rollback se der erro
+
+        BEGIN IMMEDIATE pega a trava de escrita já no começo: duas threads gravando ao mesmo
+        tempo esperam a vez pelo timeout em vez de darem 'database is locked' no meio.
+        Uma transacao() dentro de outra faz parte da de fora.
+        """
+        con = self.conexao()
+        if con.in_transaction:
+            yield con
+            return
+
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            yield con
+        except BaseException:
+            con.rollback()
+            raise
+        con.commit()
+
+    def em_transacao(self):
+        """Se a thread atual está dentro de uma transacao() (a de quem chamou)"""
+        return self.conexao().in_transaction
+
+    def fechar(self):
+        """Fecha todas as conexões (no fim do programa)"""
+        with self.trava:
+            for con in self.abertas.values():
+                con.close()
+            self.abertas.clear()
+        self.local = threading.local()
+
+
+# Um conjunto de conexões por arquivo, compartilhado por todo o processo
+_CONEXOES = {}
+_TRAVA_CONEXOES = threading.Lock()
+
+def conexoes(path=None):
+    path = Path(path if path is not None else CAMINHO_PADRAO).resolve()
+    with _TRAVA_CONEXOES:
+        if path not in _CONEXOES:
+            _CONEXOES[path] = Conexoes(path)
+        return _CONEXOES[path]
+
+def fechar(path=None):
+    """Fecha as conexões de um arquivo (ou de todos, sem path)"""
+    with _TRAVA_CONEXOES:
+        if path is None:
+            pools = list(_CONEXOES.values())
+            _CONEXOES.clear()
+        else:
+            pools = [_CONEXOES.pop(Path(path).resolve(), None)]
+    for pool in pools:
+        if pool is not None:
+            pool.fechar()
+
 
 class BaDa:
-    def __init__(self):
-        self.path = (Path(__file__).parent.parent.resolve()) / 'data' / 'Investimento.db'
+    # Quantas falhas seguidas até o ticker entrar em quarentena
+    LIMITE_FALHAS = 2
+    # Primeira quarentena; dobra a cada nova falha depois disso
+    QUARENTENA_BASE = timedelta(hours=6)
+    QUARENTENA_MAXIMA = timedelta(days=30)
+
+    # Arquivos cujas tabelas já foram conferidas neste processo
+    _preparados = set()
+
+    def __init__(self, path=None):
+        self.path = Path(path if path is not None else CAMINHO_PADRAO).resolve()
+        self.conexoes = conexoes(self.path)
+
+        # Criar um BaDa() é barato: o CREATE TABLE só roda uma vez por arquivo
+        if self.path not in BaDa._preparados:
+            self.criar_tabela()
+            BaDa._preparados.add(self.path)
 
     def consulta(self, campo):
-        con = sqlite3.connect(self.path)
-        con.close()
+        con = self.conexoes.conexao()
 
     def carregar_ticker(self):
-    
+        """Tickers da tabela ativos, menos os que estão em quarentena"""
         try:
-            con = sqlite3.connect(self.path)
-            cursor = con.cursor()
-            cursor.execute("SELECT ticker FROM ativos")
+            con = self.conexoes.conexao()
+            cursor = con.execute("""
+                SELECT ticker FROM ativos
+                WHERE ticker NOT IN (SELECT ticker FROM quarentena WHERE liberado_em > ?)
+            """, (datetime.now().isoformat(timespec='seconds'),))
             # List comprehension rápida e nativa, sem Pandas
-            resultado = [linha[0] for linha in cursor.fetchall()]
-            con.close()
-            return resultado
+            return [linha[0] for linha in cursor.fetchall()]
         except Exception as e:
             print(f"Erro no banco: {e}")
             return []
-    
+
 
     def criar_tabela(self):
-        con = sqlite3.connect(self.path)
-        con.close()
+        with self.conexoes.transacao() as con:
+            # Histórico de cotações, só cresce. A chave primária (ativo, horario) já ordena
+            # o histórico de cada ativo; o índice por horario cobre as consultas de um dia inteiro
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS cotacoes (
+                    ativo_id INTEGER NOT NULL REFERENCES ativos(id),
+                    horario TEXT NOT NULL,
+                    preco REAL NOT NULL,
+                    anterior REAL,
+                    var_reais REAL,
+                    var_pct REAL,
+                    PRIMARY KEY (ativo_id, horario)
+                ) WITHOUT ROWID
+            """)
+            con.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cotacoes_horario
+                ON cotacoes (horario, ativo_id, preco, var_reais, var_pct)
+            """)
+
+            # Agregados por hora, somados a cada refresh gravado (somar_agregados), para o
+            # relatório por horário não precisar reler o histórico:
+            #   horario_direcao: quantas cotações subiram/caíram/ficaram em cada hora do dia
+            #   barras_hora: OHLC e contagens de cada ticker em cada hora (início da hora, ISO)
+            #   ultima_cotacao: a cotação mais recente de cada ticker, base da próxima direção
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS horario_direcao (
+                    hora INTEGER NOT NULL,
+                    direcao TEXT NOT NULL,
+                    n INTEGER NOT NULL,
+                    PRIMARY KEY (hora, direcao)
+                ) WITHOUT ROWID
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS barras_hora (
+                    ativo_id INTEGER NOT NULL REFERENCES ativos(id),
+                    hora TEXT NOT NULL,
+                    abertura REAL NOT NULL,
+                    maxima REAL NOT NULL,
+                    minima REAL NOT NULL,
+                    fechamento REAL NOT NULL,
+                    n INTEGER NOT NULL,
+                    altas INTEGER NOT NULL,
+                    baixas INTEGER NOT NULL,
+                    neutros INTEGER NOT NULL,
+                    PRIMARY KEY (ativo_id, hora)
+                ) WITHOUT ROWID
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS ultima_cotacao (
+                    ativo_id INTEGER PRIMARY KEY REFERENCES ativos(id),
+                    horario TEXT NOT NULL,
+                    preco REAL NOT NULL
+                )
+            """)
+
+            # Falhas seguidas de cada ticker (sem .SA) e até quando ele fica fora das buscas
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS quarentena (
+                    ticker TEXT PRIMARY KEY,
+                    falhas INTEGER NOT NULL,
+                    ultima_falha TEXT NOT NULL,
+                    liberado_em TEXT NOT NULL
+                )
+            """)
+
+    def tempo_de_quarentena(self, falhas):
+        """Janela de exclusão para N falhas seguidas (zero abaixo do limite)"""
+        if falhas < self.LIMITE_FALHAS:
+            return timedelta(0)
+        return min(self.QUARENTENA_BASE * 2 ** (falhas - self.LIMITE_FALHAS), self.QUARENTENA_MAXIMA)
+
+    def registrar_resultado(self, tickers, com_dados):
+        """Atualiza a quarentena depois de um download
+
+        tickers: todos os tickers pedidos; com_dados: os que voltaram com cotação.
+        Quem voltou vazio soma uma falha; quem voltou com dados sai da quarentena.
+        """
+        tickers = {t.removesuffix(".SA") for t in tickers}
+        com_dados = {t.removesuffix(".SA") for t in com_dados}
+        sem_dados = tickers - com_dados
+
+        agora = datetime.now()
+
+        try:
+            with self.conexoes.transacao() as con:
+                con.executemany("DELETE FROM quarentena WHERE ticker = ?", [(t,) for t in com_dados])
+
+                if sem_dados:
+                    marcadores = ",".join("?" * len(sem_dados))
+                    falhas = dict(con.execute(
+                        f"SELECT ticker, falhas FROM quarentena WHERE ticker IN ({marcadores})", list(sem_dados)
+                    ).fetchall())
+
+                    linhas = []
+                    for ticker in sem_dados:
+                        n = falhas.get(ticker, 0) + 1
+                        liberado = agora + self.tempo_de_quarentena(n)
+                        linhas.append((ticker, n, agora.isoformat(timespec='seconds'), liberado.isoformat(timespec='seconds')))
+
+                        if n == self.LIMITE_FALHAS:
+                            print(f"{ticker} em quarentena até {liberado:%d/%m/%Y %H:%M}")
+
+                    con.executemany("INSERT OR REPLACE INTO quarentena VALUES (?, ?, ?, ?)", linhas)
+        except Exception as e:
+            print(f"Erro no banco: {e}")
+
+    def registrar_busca(self, respostas):
+        """Atualiza a quarentena com o resultado de uma busca inteira
+
+        respostas: [(tickers do lote, os que voltaram com cotação)] dos lotes que o provedor
+        respondeu. Se nenhum ticker de nenhum lote voltou com cotação, é a rede (o Yahoo
+        devolve vazio quando não conecta), não os tickers: nada entra na quarentena e a
+        próxima busca tenta todos de novo. Devolve False nesse caso.
+        """
+        tickers = [t for lote, _ in respostas for t in lote]
+        com_dados = [t for _, lote_com_dados in respostas for t in lote_com_dados]
+
+        if not com_dados:
+            if tickers:
+                print(f"Nenhum dos {len(tickers)} tickers voltou com cotação: sem conexão? Quarentena não alterada")
+            return False
+
+        self.registrar_resultado(tickers, com_dados)
+        return True
+
+    def ids_ativos(self):
+        """{ticker (sem .SA): id} da tabela ativos"""
+        con = self.conexoes.conexao()
+        return dict(con.execute("SELECT ticker, id FROM ativos").fetchall())
+
+    def salvar_cotacoes(self, df_resumo, horario=None):
+        """Acrescenta o resumo numérico de um refresh na tabela cotacoes, numa única transação"""
+        if len(df_resumo) == 0:
+            return 0
+
+        horario = (horario or datetime.now()).strftime('%Y-%m-%dT%H:%M:%S')
+        ids = self.ids_ativos()
+
+        linhas = [
+            (ids[ativo], horario, preco, anterior, var_reais, var_pct)
+            for ativo, preco, anterior, var_reais, var_pct in zip(
+                df_resumo["Ativo"], df_resumo["Preço"], df_resumo["Anterior"],
+                df_resumo["Var R$"], df_resumo["Var %"])
+            if ativo in ids
+        ]
+
+        # Dentro da transação de quem chamou, o erro sobe para ela desfazer tudo
+        externa = self.conexoes.em_transacao()
+        try:
+            self.inserir_cotacoes(linhas)
+        except Exception as e:
+            if externa:
+                raise
+            print(f"Erro no banco: {e}")
+            return 0
+
+        return len(linhas)
+
+    def inserir_cotacoes(self, linhas):
+        """Insere [(ativo_id, horario, preco, anterior, var_reais, var_pct)]; repetidas são ignoradas"""
+        with self.conexoes.transacao() as con:
+            con.executemany("""
+                INSERT OR IGNORE INTO cotacoes (ativo_id, horario, preco, anterior, var_reais, var_pct)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, linhas)
+
+    # ================================= AGREGADOS POR HORA =================================
+
+    @staticmethod
+    def linhas_agregadas(df):
+        """Contagens e barras de um histórico de cotações já com direção (reconstruir_agregados)
+
+        df: ativo_id, horario (Timestamp), preco, direcao, em ordem de horário dentro de cada ativo.
+        Devolve ([(hora, direcao, n)], [(ativo_id, hora, abertura, maxima, minima, fechamento,
+        n, altas, baixas, neutros)]), no formato dos INSERT de somar_agregados.
+        """
+        hora_do_dia = df["horario"].dt.hour
+        contagens = df.groupby([hora_do_dia, "direcao"], observed=True).size()
+
+        df = df.assign(
+            hora=df["horario"].dt.floor("h").dt.strftime('%Y-%m-%dT%H:%M:%S'),
+            altas=df["direcao"] == "Alta",
+            baixas=df["direcao"] == "Baixa",
+            neutros=df["direcao"] == "Neutro",
+        )
+        barras = df.groupby(["ativo_id", "hora"], sort=False).agg(
+            abertura=("preco", "first"), maxima=("preco", "max"), minima=("preco", "min"),
+            fechamento=("preco", "last"), n=("preco", "size"),
+            altas=("altas", "sum"), baixas=("baixas", "sum"), neutros=("neutros", "sum"),
+        ).reset_index()
+
+        return ([(int(hora), direcao, int(n)) for (hora, direcao), n in contagens.items()],
+                [(int(b.ativo_id), b.hora, b.abertura, b.maxima, b.minima, b.fechamento,
+                  int(b.n), int(b.altas), int(b.baixas), int(b.neutros)) for b in barras.itertuples(index=False)])
+
+    def gravar_agregados(self, con, contagens, barras, ultimas):
+        """Soma contagens e barras às tabelas de agregados (dentro da transação de quem chama)"""
+        con.executemany("""
+            INSERT INTO horario_direcao (hora, direcao, n) VALUES (?, ?, ?)
+            ON CONFLICT (hora, direcao) DO UPDATE SET n = n + excluded.n
+        """, contagens)
+        # A barra que já existe guarda a abertura; máxima/mínima se juntam e o fechamento é o novo
+        con.executemany("""
+            INSERT INTO barras_hora (ativo_id, hora, abertura, maxima, minima, fechamento, n, altas, baixas, neutros)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (ativo_id, hora) DO UPDATE SET
+                maxima = MAX(maxima, excluded.maxima),
+                minima = MIN(minima, excluded.minima),
+                fechamento = excluded.fechamento,
+                n = n + excluded.n,
+                altas = altas + excluded.altas,
+                baixas = baixas + excluded.baixas,
+                neutros = neutros + excluded.neutros
+        """, barras)
+        con.executemany("INSERT OR REPLACE INTO ultima_cotacao (ativo_id, horario, preco) VALUES (?, ?, ?)", ultimas)
+
+    def somar_agregados(self, df_resumo, horario, ids=None):
+        """Soma um refresh aos agregados por hora; devolve quantas cotações entraram
+
+        A direção compara o preço com a última cotação gravada de cada ticker (tabela
+        ultima_cotacao). Cotação com horário até o dessa última é ignorada: gravar o mesmo
+        refresh duas vezes não conta em dobro.
+        """
+        ids = ids if ids is not None else self.ids_ativos()
+        instante = pd.Timestamp(horario).strftime('%Y-%m-%dT%H:%M:%S')
+
+        precos = {ids[ativo]: float(preco) for ativo, preco in zip(df_resumo["Ativo"], df_resumo["Preço"])
+                  if ativo in ids and pd.notna(preco)}
+        if not precos:
+            return 0
+
+        # Dentro da transação de quem chamou (gravar_refreshes), o erro sobe para ela desfazer
+        # o refresh inteiro: engolir aqui deixaria contadores pela metade irem no commit
+        externa = self.conexoes.em_transacao()
+        try:
+            with self.conexoes.transacao() as con:
+                marcadores = ",".join("?" * len(precos))
+                anteriores = {id_: (ultimo, preco) for id_, ultimo, preco in con.execute(
+                    f"SELECT ativo_id, horario, preco FROM ultima_cotacao WHERE ativo_id IN ({marcadores})",
+                    list(precos))}
+
+                novos = [(id_, preco) for id_, preco in precos.items()
+                         if id_ not in anteriores or anteriores[id_][0] < instante]
+                if not novos:
+                    return 0
+
+                # Um refresh tem uma cotação por ticker: cada uma é uma barra de um ponto só,
+                # que o ON CONFLICT junta com a barra da hora que já existir
+                # A primeira cotação do ticker (sem anterior) conta como Neutro
+                delta = [preco - anteriores[id_][1] if id_ in anteriores else np.nan for id_, preco in novos]
+                codigos = movimento.classificar_movimento(delta).codes
+                hora_do_dia = int(instante[11:13])
+                hora = instante[:13] + ":00:00"
+
+                contagens = [(hora_do_dia, direcao, int(n)) for direcao, n in
+                             zip(movimento.DIRECOES, np.bincount(codigos, minlength=len(movimento.DIRECOES))) if n]
+                barras = [(id_, hora, preco, preco, preco, preco, 1, int(codigo == 0), int(codigo == 1), int(codigo == 2))
+                          for (id_, preco), codigo in zip(novos, codigos)]
+                self.gravar_agregados(con, contagens, barras, [(id_, instante, preco) for id_, preco in novos])
+        except Exception as e:
+            if externa:
+                raise
+            print(f"Erro no banco: {e}")
+            return 0
+
+        return len(novos)
+
+    def reconstruir_agregados(self):
+        """Refaz os agregados por hora do zero a partir da tabela cotacoes
+
+        Para depois de importar histórico antigo (importa_snapshots), que entra fora da
+        ordem dos refreshes.
+        """
+        con = self.conexoes.conexao()
+        df = pd.read_sql_query(
+            "SELECT ativo_id, horario, preco FROM cotacoes ORDER BY ativo_id, horario", con, parse_dates=["horario"])
+        df["direcao"] = movimento.classificar_movimento(df["preco"] - df.groupby("ativo_id")["preco"].shift(1))
+        contagens, barras = self.linhas_agregadas(df)
+
+        ultimas = df.groupby("ativo_id").tail(1)
+        ultimas = [(int(id_), horario.strftime('%Y-%m-%dT%H:%M:%S'), preco)
+                   for id_, horario, preco in zip(ultimas["ativo_id"], ultimas["horario"], ultimas["preco"])]
+
+        with self.conexoes.transacao() as con:
+            con.execute("DELETE FROM horario_direcao")
+            con.execute("DELETE FROM barras_hora")
+            con.execute("DELETE FROM ultima_cotacao")
+            self.gravar_agregados(con, contagens, barras, ultimas)
+
+        print(f"Agregados por hora refeitos: {len(df)} cotações, {len(barras)} barras")
+        return len(df)
+
+    def horario_por_direcao(self):
+        """{hora: {direcao: n}} de todo o histórico gravado (leitura direta, sem reprocessar)"""
+        contadores = {}
+        for hora, direcao, n in self.conexoes.conexao().execute("SELECT hora, direcao, n FROM horario_direcao"):
+            contadores.setdefault(hora, {})[direcao] = n
+        return contadores
+
+    def barras_por_hora(self, ticker, inicio=None, fim=None):
+        """OHLC e contagens de um ticker por hora entre inicio e fim (datas ou textos ISO)"""
+        comando = """
+            SELECT b.hora, b.abertura, b.maxima, b.minima, b.fechamento, b.n, b.altas, b.baixas, b.neutros
+            FROM barras_hora b JOIN ativos a ON a.id = b.ativo_id
+            WHERE a.ticker = ? AND b.hora >= ? AND b.hora < ?
+            ORDER BY b.hora
+        """
+        params = (ticker.removesuffix(".SA"), self.limite_iso(inicio, "0000"), self.limite_iso(fim, "9999"))
+
+        return pd.read_sql_query(comando, self.conexoes.conexao(), params=params, parse_dates=["hora"])
+
+    def historico(self, ticker, inicio=None, fim=None):
+        """Cotações de um ticker entre inicio e fim (datas ou textos ISO)"""
+        comando = """
+            SELECT c.horario, c.preco, c.anterior, c.var_reais, c.var_pct
+            FROM cotacoes c JOIN ativos a ON a.id = c.ativo_id
+            WHERE a.ticker = ? AND c.horario >= ? AND c.horario < ?
+            ORDER BY c.horario
+        """
+        params = (ticker.removesuffix(".SA"), self.limite_iso(inicio, "0000"), self.limite_iso(fim, "9999"))
+
+        return pd.read_sql_query(comando, self.conexoes.conexao(), params=params, parse_dates=["horario"])
+
+    def cotacoes_do_dia(self, dia):
+        """Todas as cotações de um dia (date, datetime ou 'AAAA-MM-DD')"""
+        inicio = pd.Timestamp(dia).normalize()
+        comando = """
+            SELECT a.ticker, c.horario, c.preco, c.var_reais, c.var_pct
+            FROM cotacoes c JOIN ativos a ON a.id = c.ativo_id
+            WHERE c.horario >= ? AND c.horario < ?
+            ORDER BY c.horario, a.ticker
+        """
+        params = (self.limite_iso(inicio), self.limite_iso(inicio + pd.Timedelta(days=1)))
+
+        return pd.read_sql_query(comando, self.conexoes.conexao(), params=params, parse_dates=["horario"])
+
+    @staticmethod
+    def limite_iso(momento, padrao=None):
+        if momento is None:
+            return padrao
+        if isinstance(momento, str):
+            return momento
+        return pd.Timestamp(momento).strftime('%Y-%m-%dT%H:%M:%S')
+
+    def em_quarentena(self):
+        """DataFrame com a quarentena atual (para conferência)"""
+        return pd.read_sql_query("SELECT * FROM quarentena ORDER BY liberado_em DESC", self.conexoes.conexao())
 
 
 if __name__ == "__main__":
@@ -35,4 +514,5 @@ if __name__ == "__main__":
 
     lista = c.carregar_ticker()
 
-    print(lista)
\ No newline at end of file
+    print(lista)
+    print(c.em_quarentena())
@@ -0,0 +1,121 @@
+import pandas as pd
+import classBanco
+
+# Nome das colunas no yf.download -> nome das colunas na tabela
+CAMPOS = {
+    "Open": "abertura",
+    "High": "maxima",
+    "Low": "minima",
+    "Close": "fechamento",
+    "Volume": "volume",
+}
+
+class Barras:
+    """Guarda os pregões (OHLCV) de cada ticker para baixar só o que falta"""
+
+    def __init__(self, path=None):
+        if path is None:
+            path = classBanco.CAMINHO_PADRAO
+        self.path = path
+        self.conexoes = classBanco.conexoes(path)
+        self.criar_tabela()
+
+    def criar_tabela(self):
+        with self.conexoes.transacao() as con:
+            # ticker no formato do Yahoo (com .SA), data no formato AAAA-MM-DD
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS barras (
+                    ticker TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    abertura REAL,
+                    maxima REAL,
+                    minima REAL,
+                    fechamento REAL,
+                    volume REAL,
+                    PRIMARY KEY (ticker, data)
+                ) WITHOUT ROWID
+            """)
+
+    def ultimas_datas(self):
+        """Devolve {ticker: data do último pregão salvo}"""
+        try:
+            cursor = self.conexoes.conexao().execute("SELECT ticker, MAX(data) FROM barras GROUP BY ticker")
+            return dict(cursor.fetchall())
+        except Exception as e:
+            print(f"Erro no banco: {e}")
+            return {}
+
+    def grupos_de_download(self, tickers_formatados):
+        """Agrupa os tickers pelo que falta baixar: [(grupo, argumentos do download)]
+
+        Quem nunca foi baixado pede os 2 últimos pregões. Os outros pedem a partir do
+        último pregão salvo, que é baixado de novo porque o candle do dia muda até o fechamento.
+        """
+        ultimas = self.ultimas_datas()
+
+        grupos = {}
+        for ticker in tickers_formatados:
+            grupos.setdefault(ultimas.get(ticker), []).append(ticker)
+
+        return [(grupo, {"period": "2d"} if inicio is None else {"start": inicio})
+                for inicio, grupo in grupos.items()]
+
+    def salvar(self, dados, tickers_formatados):
+        """Mescla o DataFrame do yf.download na tabela (o pregão repetido é sobrescrito)"""
+        if dados is None or dados.empty:
+            return 0
+
+        # Com um único ticker o yf.download pode devolver colunas sem o nível do ticker
+        if not isinstance(dados.columns, pd.MultiIndex):
+            dados = pd.concat({tickers_formatados[0]: dados}, axis=1)
+
+        linhas = []
+        datas = dados.index.strftime('%Y-%m-%d')
+
+        for ticker in dados.columns.get_level_values(0).unique():
+            df_ativo = dados[ticker].reindex(columns=list(CAMPOS))
+            df_ativo = df_ativo.set_axis(datas)
+            df_ativo = df_ativo.dropna(subset=["Close"])
+
+            for data, linha in zip(df_ativo.index, df_ativo.itertuples(index=False)):
+                linhas.append((ticker, data, *[None if pd.isna(v) else float(v) for v in linha]))
+
+        with self.conexoes.transacao() as con:
+            con.executemany("""
+                INSERT OR REPLACE INTO barras (ticker, data, abertura, maxima, minima, fechamento, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, linhas)
+
+        return len(linhas)
+
+    def carregar(self, tickers_formatados, quantidade=2):
+        """Monta os últimos pregões de cada ticker no mesmo formato do yf.download (group_by='ticker')"""
+        if not tickers_formatados:
+            return pd.DataFrame()
+
+        marcadores = ",".join("?" * len(tickers_formatados))
+        comando = f"""
+            SELECT ticker, data, abertura, maxima, minima, fechamento, volume FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY data DESC) AS ordem
+                FROM barras
+                WHERE ticker IN ({marcadores})
+            )
+            WHERE ordem <= ?
+        """
+
+        df = pd.read_sql_query(comando, self.conexoes.conexao(), params=[*tickers_formatados, quantidade])
+
+        if df.empty:
+            return pd.DataFrame()
+
+        df['data'] = pd.to_datetime(df['data'])
+        df = df.rename(columns={v: k for k, v in CAMPOS.items()})
+
+        dados = df.pivot(index='data', columns='ticker', values=list(CAMPOS))
+        dados = dados.swaplevel(axis=1).sort_index(axis=1)
+        return dados
+
+
+if __name__ == "__main__":
+    b = Barras()
+    print(b.ultimas_datas())
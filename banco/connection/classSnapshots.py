@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import pandas as pd
+from pathlib import Path
+
+# Nome de cada dia dentro da pasta: AAAA/MM/DD, com os snapshots HHMMSS.json
+# e um manifesto.json: {arquivo: {"inicio", "fim", "tickers", "bytes"}}
+MANIFESTO = "manifesto.json"
+
+def horario_do_caminho(caminho):
+    """Horário de um snapshot pelo nome do arquivo (None se o nome não tiver padrão conhecido)
+
+    AAAA/MM/DD/HHMMSS.json: formato atual
+    %H-%M-%S_-_%Y_%m_%d.csv: CSV do legado
+    %Hh-%Mm-%Ss_-_%d-%m.json: formato antigo, sem o ano; usa o da data de modificação
+                              (ou o anterior, se cair no futuro)
+    """
+    caminho = Path(caminho)
+    try:
+        if caminho.stem.isdigit() and len(caminho.stem) == 6:
+            dia = caminho.parent
+            return pd.to_datetime(f"{dia.parent.parent.name}{dia.parent.name}{dia.name}{caminho.stem}",
+                                  format="%Y%m%d%H%M%S")
+        if "h-" in caminho.stem:
+            modificado = pd.Timestamp.fromtimestamp(caminho.stat().st_mtime)
+            horario = pd.to_datetime(f"{modificado.year}_{caminho.stem}", format="%Y_%Hh-%Mm-%Ss_-_%d-%m")
+            if horario > modificado + pd.Timedelta(days=1):
+                horario = horario.replace(year=horario.year - 1)
+            return horario
+        return pd.to_datetime(caminho.stem, format="%H-%M-%S_-_%Y_%m_%d")
+    except (ValueError, OSError):
+        return None
+
+class Snapshots:
+    """Snapshots JSON do dado-do-dia organizados por data (AAAA/MM/DD/HHMMSS.json)
+
+    Os nomes ordenam em ordem cronológica e o manifesto de cada dia diz o intervalo de
+    horário, a quantidade de tickers e o tamanho de cada arquivo. Uma consulta por período
+    só abre as pastas dos dias pedidos e só lê os arquivos que caem no intervalo.
+    """
+
+    def __init__(self, pasta=None):
+        if pasta is None:
+            pasta = Path(__file__).parent.parent.resolve() / 'arquivos' / 'dado-do-dia'
+        self.pasta = Path(pasta)
+        self.trava = threading.Lock()
+
+    def pasta_do_dia(self, dia):
+        dia = pd.Timestamp(dia)
+        return self.pasta / f"{dia:%Y}" / f"{dia:%m}" / f"{dia:%d}"
+
+    def caminho(self, horario):
+        horario = pd.Timestamp(horario)
+        return self.pasta_do_dia(horario) / f"{horario:%H%M%S}.json"
+
+    # ================================= MANIFESTO =================================
+
+    def ler_manifesto(self, pasta_dia):
+        arquivo = pasta_dia / MANIFESTO
+        if not arquivo.exists():
+            return {}
+        with open(arquivo, encoding="utf-8") as f:
+            return json.load(f)
+
+    def gravar_manifesto(self, pasta_dia, manifesto):
+        # Grava num temporário e troca, para nunca deixar um manifesto pela metade
+        temporario = pasta_dia / (MANIFESTO + ".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, indent=4)
+        os.replace(temporario, pasta_dia / MANIFESTO)
+
+    def descrever(self, arquivo, df):
+        """Entrada do manifesto para um snapshot"""
+        horarios = pd.to_datetime(df["Horario"]) if "Horario" in df.columns else pd.Series(dtype="datetime64[ns]")
+        if horarios.empty:
+            # Sem coluna de horário: vale o do nome do arquivo
+            horarios = pd.Series([horario_do_caminho(arquivo)])
+        return {
+            "inicio": horarios.min().isoformat(),
+            "fim": horarios.max().isoformat(),
+            "tickers": int(df["Ativo"].nunique()) if "Ativo" in df.columns else len(df),
+            "bytes": arquivo.stat().st_size,
+        }
+
+    def manifesto_do_dia(self, pasta_dia):
+        """Manifesto do dia, completando arquivos que estejam na pasta mas fora dele"""
+        with self.trava:
+            manifesto = self.ler_manifesto(pasta_dia)
+            faltando = [a for a in pasta_dia.glob("*.json") if a.name != MANIFESTO and a.name not in manifesto]
+            for arquivo in faltando:
+                manifesto[arquivo.name] = self.descrever(arquivo, pd.read_json(arquivo, orient="records"))
+            if faltando:
+                self.gravar_manifesto(pasta_dia, manifesto)
+            return manifesto
+
+    # ================================= ESCRITA =================================
+
+    def salvar(self, df_snapshot, horario):
+        """Grava um snapshot e registra no manifesto do dia; devolve o caminho"""
+        arquivo = self.caminho(horario)
+
+        with self.trava:
+            arquivo.parent.mkdir(parents=True, exist_ok=True)
+            df_snapshot.to_json(
+                arquivo,
+                orient="records",   # Cria uma lista de objetos
+                indent=4,           # Deixa o JSON legível
+                force_ascii=False   # Permite acentos
+            )
+
+            manifesto = self.ler_manifesto(arquivo.parent)
+            manifesto[arquivo.name] = self.descrever(arquivo, df_snapshot)
+            self.gravar_manifesto(arquivo.parent, manifesto)
+
+        return arquivo
+
+    def organizar_antigos(self):
+        """Move os snapshots antigos (%Hh-%Mm-%Ss_-_%d-%m.json, soltos na pasta) para AAAA/MM/DD
+
+        O nome antigo não tem o ano: usa o da data de modificação do arquivo.
+        """
+        movidos = 0
+        for arquivo in sorted(self.pasta.glob("*.json")):
+            horario = horario_do_caminho(arquivo)
+            if horario is None:
+                print(f"Nome fora do padrão, ficou onde estava: {arquivo.name}")
+                continue
+
+            destino = self.caminho(horario)
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(arquivo, destino)
+            movidos += 1
+
+        print(f"{movidos} snapshots reorganizados")
+        return movidos
+
+    # ================================= LEITURA =================================
+
+    def listar(self, inicio, fim):
+        """Caminhos dos snapshots com horário entre inicio e fim (inclusive), em ordem"""
+        inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+        arquivos = []
+
+        for dia in pd.date_range(inicio.normalize(), fim.normalize()):
+            pasta_dia = self.pasta_do_dia(dia)
+            if not pasta_dia.exists():
+                continue
+
+            for nome, item in sorted(self.manifesto_do_dia(pasta_dia).items()):
+                if pd.Timestamp(item["fim"]) >= inicio and pd.Timestamp(item["inicio"]) <= fim:
+                    arquivos.append(pasta_dia / nome)
+
+        return arquivos
+
+    def carregar(self, inicio, fim):
+        """Todos os snapshots do período num DataFrame só"""
+        partes = [pd.read_json(arquivo, orient="records") for arquivo in self.listar(inicio, fim)]
+        if not partes:
+            return pd.DataFrame()
+        return pd.concat(partes, ignore_index=True)
+
+    def resumo_do_periodo(self, inicio, fim):
+        """Manifesto do período como DataFrame (sem abrir nenhum snapshot)"""
+        linhas = []
+        for dia in pd.date_range(pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize()):
+            pasta_dia = self.pasta_do_dia(dia)
+            if pasta_dia.exists():
+                for nome, item in sorted(self.manifesto_do_dia(pasta_dia).items()):
+                    linhas.append({"arquivo": str(pasta_dia / nome), **item})
+        return pd.DataFrame(linhas)
+
+
+if __name__ == "__main__":
+    s = Snapshots()
+    s.organizar_antigos()
+    hoje = pd.Timestamp.now()
+    print(s.resumo_do_periodo(hoje - pd.Timedelta(days=7), hoje))
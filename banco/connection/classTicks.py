@@ -0,0 +1,115 @@
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Um registro de largura fixa (36 bytes, sem cabeçalho nem separador)
+# horario: nanossegundos desde 1970 (vira datetime64[ns] sem cópia)
+# ativo: id da tabela ativos
+# preco / var_reais: centavos; var_pct: centésimos de ponto percentual (1,23% -> 123)
+REGISTRO = np.dtype([
+    ("horario", "<i8"),
+    ("ativo", "<i4"),
+    ("preco", "<i8"),
+    ("var_reais", "<i8"),
+    ("var_pct", "<i8"),
+])
+
+class Ticks:
+    """Log binário só de acréscimo, um arquivo por dia (AAAA-MM-DD.bin)
+
+    Bem menor e muito mais rápido de reler que os JSON do dado-do-dia: a leitura
+    mapeia o arquivo na memória (numpy.memmap) e devolve o array direto, sem parse.
+    """
+
+    def __init__(self, pasta=None):
+        if pasta is None:
+            pasta = Path(__file__).parent.parent.resolve() / 'arquivos' / 'ticks'
+        self.pasta = Path(pasta)
+        self.trava = threading.Lock()
+
+    def arquivo(self, dia):
+        return self.pasta / f"{pd.Timestamp(dia):%Y-%m-%d}.bin"
+
+    def registros(self, df_resumo, horario, ids):
+        """Converte um resumo numérico em registros; tickers fora de `ids` ficam de fora"""
+        ativos = df_resumo["Ativo"].map(ids)
+        validos = ativos.notna().to_numpy()
+
+        registros = np.empty(int(validos.sum()), dtype=REGISTRO)
+        registros["horario"] = pd.Timestamp(horario).value
+        registros["ativo"] = ativos.to_numpy()[validos].astype(np.int32)
+        for campo, coluna in (("preco", "Preço"), ("var_reais", "Var R$"), ("var_pct", "Var %")):
+            valores = df_resumo[coluna].to_numpy(dtype=np.float64)[validos]
+            registros[campo] = np.rint(np.nan_to_num(valores) * 100).astype(np.int64)
+        return registros
+
+    def acrescentar(self, df_resumo, horario, ids):
+        """Acrescenta um refresh no arquivo do dia e devolve quantos registros gravou"""
+        registros = self.registros(df_resumo, horario, ids)
+        if len(registros) == 0:
+            return 0
+
+        with self.trava:
+            self.pasta.mkdir(parents=True, exist_ok=True)
+            with open(self.arquivo(horario), "ab") as f:
+                # Descarta um registro incompleto no fim (programa fechado no meio de uma
+                # escrita): sem isso todos os registros seguintes ficariam desalinhados
+                sobra = f.tell() % REGISTRO.itemsize
+                if sobra:
+                    f.truncate(f.tell() - sobra)
+                f.write(registros.tobytes())
+        return len(registros)
+
+    def ler_dia(self, dia):
+        """Registros de um dia como numpy.memmap só de leitura (array vazio se não houver)"""
+        arquivo = self.arquivo(dia)
+        if not arquivo.exists():
+            return np.empty(0, dtype=REGISTRO)
+
+        # Ignora um registro incompleto no fim (programa fechado no meio de uma escrita)
+        quantidade = arquivo.stat().st_size // REGISTRO.itemsize
+        if quantidade == 0:
+            return np.empty(0, dtype=REGISTRO)
+        return np.memmap(arquivo, dtype=REGISTRO, mode="r", shape=(quantidade,))
+
+    def primeiro_dia(self):
+        """Dia do arquivo mais antigo (None se ainda não houver nenhum)"""
+        arquivos = sorted(self.pasta.glob("*.bin"))
+        return pd.Timestamp(arquivos[0].stem) if arquivos else None
+
+    def dias(self, inicio, fim):
+        """Gerador: (dia, memmap) dos dias entre inicio e fim (inclusive) que têm arquivo
+
+        Nenhuma cópia: cada dia é lido direto do arquivo só quando é usado.
+        """
+        for dia in pd.date_range(pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize()):
+            registros = self.ler_dia(dia)
+            if len(registros):
+                yield dia, registros
+
+    def copiar_periodo(self, inicio, fim):
+        """Todos os registros do período num único array novo (copia tudo; sem cópia use dias)"""
+        partes = [registros for _, registros in self.dias(inicio, fim)]
+        if not partes:
+            return np.empty(0, dtype=REGISTRO)
+        return np.concatenate(partes)
+
+def para_dataframe(registros, nomes=None):
+    """DataFrame com horario datetime e valores em reais/percentual; nomes: {id: ticker}"""
+    df = pd.DataFrame({
+        "horario": registros["horario"].view("datetime64[ns]"),
+        "ativo": registros["ativo"],
+        "preco": registros["preco"] / 100,
+        "var_reais": registros["var_reais"] / 100,
+        "var_pct": registros["var_pct"] / 100,
+    })
+    if nomes is not None:
+        df["ativo"] = df["ativo"].map(nomes)
+    return df
+
+
+if __name__ == "__main__":
+    t = Ticks()
+    hoje = pd.Timestamp.now()
+    print(para_dataframe(t.ler_dia(hoje)))
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+# Direção de uma cotação em relação à anterior do mesmo ticker. Usado pela analise_padroes
+# e pelos agregados por hora do classBanco, para os dois contarem igual.
+
+# Rótulos na ordem (subiu, caiu, parado)
+DIRECOES = ['Alta', 'Baixa', 'Neutro']
+# Variações até este valor (em R$, para cima ou para baixo) contam como paradas
+ZONA_NEUTRA = 0.001
+
+def classificar_movimento(delta, rotulos=DIRECOES, zona_neutra=ZONA_NEUTRA, zona_neutra_queda=None):
+    """Classifica variações em (subiu, caiu, parado) de uma vez, sem apply linha a linha
+
+    zona_neutra vale para os dois lados; zona_neutra_queda muda só o lado da queda.
+    NaN (primeiro registro de cada ticker) conta como parado, igual ao apply antigo.
+    Devolve um Categorical (1 byte por linha) com as categorias na ordem de `rotulos`.
+    """
+    valores = np.asarray(delta, dtype=np.float64)
+    queda = zona_neutra if zona_neutra_queda is None else zona_neutra_queda
+
+    # Fora da zona neutra a direção vem do lado em que caiu; o resto (e NaN) fica parado
+    codigos = np.select([valores > zona_neutra, valores < -queda], [np.int8(0), np.int8(1)], default=np.int8(2))
+    return pd.Categorical.from_codes(codigos, categories=rotulos, validate=False)
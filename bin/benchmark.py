@@ -0,0 +1,90 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent / 'banco' / 'connection'))
+sys.path.append(str(Path(__file__).parent.parent / 'arq' / 'src'))
+import classBanco
+import classBarras
+import baixador
+import provedores
+import resumo
+import funcoes
+import argparse
+import tempfile
+import time
+
+# Mede o caminho buscar -> resumir -> salvar -> exibir sem rede, com o ProvedorReplay
+
+def cronometrar(etapas, nome, funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    etapas.setdefault(nome, []).append(time.perf_counter() - inicio)
+    return resultado
+
+def linhas_da_tabela(df_exibicao):
+    """O que seria passado para o tree.insert, linha a linha"""
+    return [((linha[0], linha[1], linha[2], linha[3]), (linha[4],))
+            for linha in df_exibicao.itertuples(index=False)]
+
+def conferir_quarentena(banco, mortos, rodadas):
+    """Os tickers sem cotação têm que somar uma falha por rodada; os outros, nenhuma"""
+    quarentena = banco.em_quarentena()
+    falhas = dict(zip(quarentena["ticker"], quarentena["falhas"]))
+    esperado = {t.removesuffix(".SA"): rodadas for t in mortos}
+
+    if falhas != esperado:
+        erradas = {t: falhas.get(t) for t in set(falhas) | set(esperado) if falhas.get(t) != esperado.get(t)}
+        raise AssertionError(f"Quarentena errada: {erradas}")
+    print(f"Quarentena: {len(mortos)} tickers sem cotação com {rodadas} falhas cada")
+
+def rodar(quantidade, rodadas, latencia, latencia_ticker, tamanho_lote, max_workers, quantidade_mortos=0):
+    tickers = resumo.formatar_tickers([f"T{i:04d}" for i in range(quantidade)])
+    # Tickers que não existem mais, misturados aos outros como na lista real
+    mortos = resumo.formatar_tickers([f"MORTO{i:03d}" for i in range(quantidade_mortos)])
+    tickers = tickers + mortos
+
+    provedor = provedores.ProvedorReplay(latencia=latencia, latencia_ticker=latencia_ticker, sem_dados=mortos)
+    # Sem espera entre tentativas: o lote só de tickers mortos é repetido a cada rodada
+    b = baixador.Baixador(provedor=provedor, tamanho_lote=tamanho_lote, max_workers=max_workers, espera=0)
+    etapas = {}
+
+    with tempfile.TemporaryDirectory() as pasta:
+        barras = classBarras.Barras(Path(pasta) / 'bench.db')
+        # Quarentena no arquivo temporário, para não mexer no Investimento.db
+        banco = classBanco.BaDa(Path(pasta) / 'bench.db')
+
+        for rodada in range(rodadas):
+            dados = cronometrar(etapas, "buscar", funcoes.baixar_incremental, tickers, barras, b, banco)
+            df = cronometrar(etapas, "resumir", resumo.resumir_cotacoes, dados, tickers)
+            arquivo = Path(pasta) / f'{rodada}.json'
+            cronometrar(etapas, "salvar", df.to_json, arquivo, orient="records", force_ascii=False)
+            exibicao = cronometrar(etapas, "formatar", resumo.formatar_resumo, df)
+            cronometrar(etapas, "exibir", linhas_da_tabela, exibicao)
+
+        conferir_quarentena(banco, mortos, rodadas)
+
+        # Rede fora: a busca inteira volta vazia e a quarentena não pode mudar
+        provedor.sem_dados = set(tickers)
+        funcoes.baixar_incremental(tickers, barras, b, banco)
+        conferir_quarentena(banco, mortos, rodadas)
+
+        # Solta o arquivo antes de apagar a pasta temporária
+        classBanco.fechar(barras.path)
+
+    print(f"\n{quantidade} tickers, {rodadas} rodadas")
+    for nome, tempos in etapas.items():
+        print(f"{nome:>10}: primeira {tempos[0] * 1000:8.1f} ms | "
+              f"média {sum(tempos) / len(tempos) * 1000:8.1f} ms | "
+              f"mínimo {min(tempos) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offline do fluxo de cotações")
+    parser.add_argument("--tickers", type=int, default=600)
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos por chamada ao provedor")
+    parser.add_argument("--latencia-ticker", type=float, default=0.005, help="segundos extras por ticker")
+    parser.add_argument("--lote", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mortos", type=int, default=10, help="tickers sem cotação misturados à lista")
+    args = parser.parse_args()
+
+    rodar(args.tickers, args.rodadas, args.latencia, args.latencia_ticker, args.lote, args.workers, args.mortos)
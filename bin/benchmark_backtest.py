@@ -0,0 +1,51 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent / 'analise'))
+import backtest
+import argparse
+import os
+import time
+import numpy as np
+
+# Mede a varredura da grade de parâmetros do backtest em todos os processos da máquina,
+# com uma grade densa (milhares de combinações) sobre o universo inteiro
+
+GRADE_DENSA = {
+    'cruzamento_medias': {'rapida': list(range(3, 43)), 'lenta': list(range(20, 220, 5))},
+    'rsi': {'n': [5, 7, 9, 11, 14, 21, 28], 'compra': list(range(15, 41, 5)), 'venda': list(range(55, 86, 5))},
+    'rompimento': {'entrada': list(range(5, 65, 5)), 'saida': list(range(3, 33, 3))},
+    'bollinger': {'n': list(range(10, 65, 5)), 'k': [1.0, 1.5, 2.0, 2.5, 3.0, 3.5]},
+}
+
+def gerar_matriz(tickers, colunas, lacunas, gerador):
+    retornos = gerador.normal(0, 0.004, (tickers, colunas))
+    matriz = gerador.uniform(5, 100, (tickers, 1)) * np.exp(np.cumsum(retornos, axis=1))
+    matriz[gerador.random((tickers, colunas)) < lacunas] = np.nan
+    return matriz
+
+def rodar(tickers, colunas, combinacoes, processos, semente):
+    gerador = np.random.default_rng(semente)
+    matriz = gerar_matriz(tickers, colunas, 0.05, gerador)
+
+    tarefas = backtest.combinacoes(GRADE_DENSA)
+    tarefas = [tarefas[i] for i in gerador.permutation(len(tarefas))[:combinacoes]]
+
+    print(f"\n{tickers} tickers × {colunas:,} horários, {len(tarefas)} combinações, "
+          f"{processos or os.cpu_count()} processos")
+    inicio = time.perf_counter()
+    resultados = backtest.rodar(matriz, np.arange(tickers), tarefas, processos)
+    tempo = time.perf_counter() - inicio
+
+    print(f"  {tempo:8.2f} s | {len(tarefas) / tempo:8.1f} combinações/s | {len(resultados):,} linhas de resultado")
+    print(backtest.resumo_por_regra(resultados).head(5).round(4).to_string())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do backtest em paralelo")
+    parser.add_argument("--tickers", type=int, default=400)
+    parser.add_argument("--horarios", type=int, default=7_056, help="7056 = 1 ano de barras de 15 min")
+    parser.add_argument("--combinacoes", type=int, default=2_000)
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    rodar(args.tickers, args.horarios, args.combinacoes, args.processos, args.semente)
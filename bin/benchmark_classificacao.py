@@ -0,0 +1,44 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent / 'analise'))
+import analise_padroes
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+# Compara a classificação antiga (apply com lambda, uma chamada Python por linha)
+# com o classificar_movimento vetorizado
+
+def classificar_antigo(delta):
+    return delta.apply(lambda x: 'Alta' if x > 0.001 else ('Baixa' if x < -0.001 else 'Neutro'))
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+def rodar(linhas, semente):
+    gerador = np.random.default_rng(semente)
+
+    # Variações pequenas (muitas dentro da zona neutra) e alguns NaN, como no histórico real
+    delta = pd.Series(np.round(gerador.normal(0, 0.02, linhas), 3))
+    delta[gerador.random(linhas) < 0.01] = np.nan
+
+    antigo, tempo_antigo = cronometrar(classificar_antigo, delta)
+    novo, tempo_novo = cronometrar(analise_padroes.classificar_movimento, delta)
+
+    iguais = (antigo.to_numpy() == np.asarray(novo, dtype=object)).all()
+
+    print(f"\n{linhas:,} linhas")
+    print(f"    apply: {tempo_antigo:8.3f} s | {antigo.memory_usage(deep=True) / 1e6:8.1f} MB")
+    print(f"  vetorial: {tempo_novo:8.3f} s | {novo.memory_usage(deep=True) / 1e6:8.1f} MB")
+    print(f"  {tempo_antigo / tempo_novo:.0f}x mais rápido | resultados iguais: {iguais}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da classificação de movimentos")
+    parser.add_argument("--linhas", type=int, default=10_000_000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    rodar(args.linhas, args.semente)
@@ -0,0 +1,61 @@
+from pathlib import Path
+import sys
+sys.path.append(str(Path(__file__).parent.parent / 'analise'))
+import indicadores
+import argparse
+import time
+import numpy as np
+
+# Mede os indicadores na matriz tickers × horários com o tamanho do universo inteiro
+# (~400 tickers) por vários anos, com buracos de quem pulou refreshes
+
+def gerar_matriz(tickers, colunas, lacunas, gerador):
+    # Passeio aleatório multiplicativo, cada ticker com um preço inicial diferente
+    retornos = gerador.normal(0, 0.002, (tickers, colunas))
+    matriz = gerador.uniform(5, 100, (tickers, 1)) * np.exp(np.cumsum(retornos, axis=1))
+    matriz[gerador.random((tickers, colunas)) < lacunas] = np.nan
+    return matriz
+
+def cronometrar(funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    funcao(*args, **kwargs)
+    return time.perf_counter() - inicio
+
+def rodar(tickers, anos, barras_por_dia, lacunas, semente):
+    gerador = np.random.default_rng(semente)
+    colunas = anos * 252 * barras_por_dia
+    fechamento = gerar_matriz(tickers, colunas, lacunas, gerador)
+    amplitude = np.abs(gerador.normal(0, 0.003, fechamento.shape)) * fechamento
+    maxima, minima = fechamento + amplitude, fechamento - amplitude
+
+    celulas = fechamento.size
+    print(f"\n{tickers} tickers × {colunas:,} horários ({anos} anos, {barras_por_dia} por dia, "
+          f"{lacunas:.0%} de lacunas) = {celulas / 1e6:.1f} M células, {fechamento.nbytes / 1e6:.0f} MB")
+
+    casos = [
+        ("SMA 20", indicadores.sma, (fechamento, 20), {}),
+        ("EMA 21", indicadores.ema, (fechamento, 21), {}),
+        ("RSI 14", indicadores.rsi, (fechamento, 14), {}),
+        ("MACD 12/26/9", indicadores.macd, (fechamento,), {}),
+        ("Bollinger 20", indicadores.bollinger, (fechamento, 20), {}),
+        ("ATR 14", indicadores.atr, (fechamento, 14), {"maxima": maxima, "minima": minima}),
+    ]
+
+    total = 0.0
+    for nome, funcao, args, kwargs in casos:
+        tempo = cronometrar(funcao, *args, **kwargs)
+        total += tempo
+        print(f"  {nome:14s} {tempo:8.3f} s | {celulas / tempo / 1e6:8.1f} M células/s")
+    print(f"  {'todos':14s} {total:8.3f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos indicadores técnicos")
+    parser.add_argument("--tickers", type=int, default=400)
+    parser.add_argument("--anos", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--barras-por-dia", type=int, default=28, help="28 = barras de 15 min no pregão")
+    parser.add_argument("--lacunas", type=float, default=0.05, help="fração de refreshes sem cotação")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    for anos in args.anos:
+        rodar(args.tickers, anos, args.barras_por_dia, args.lacunas, args.semente)
@@ -5,9 +5,13 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent / 'banco' / 'connection'))
 print((Path(__file__).parent.parent / 'banco' / 'connection'))
 import classBanco
+sys.path.append(str(Path(__file__).parent.parent / 'arq' / 'src'))
+import resumo
+import funcoes
+import agendador
+import argparse
 import time
 import requests
-import yfinance as yf
 from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 import os
@@ -113,57 +117,13 @@ def processo_de_busca():
 
     inicio = time.time()
 
-    tickers_formatados = [t + ".SA" 
-                          if not t.endswith(".SA") else t 
-                          for t in lista_tickers]
-    
-    string_tickers = " ".join(tickers_formatados)
-
-    dados = yf.download(string_tickers, period="2d", group_by='ticker', threads=True, progress=False)
+    tickers_formatados = resumo.formatar_tickers(lista_tickers)
 
-    lista_final = []
-
-    for ticker in tickers_formatados:
-        try:
-            # Acessa os dados desse ticker
-            df_ativo = dados[ticker]
-            df_ativo = df_ativo.dropna()
-
-            if len(df_ativo) < 1:
-                continue
-
-            # Pega preço atual
-            preco_atual = df_ativo['Close'].iloc[-1]
-            
-            # Tenta calcular variação
-            if len(df_ativo) >= 2:
-                fechamento_ontem = df_ativo['Close'].iloc[-2]
-                var_reais = preco_atual - fechamento_ontem
-                var_pct = (var_reais / fechamento_ontem) * 100
-            else:
-                var_reais = 0.0
-                var_pct = 0.0
-
-            # Limpa o nome
-            simbolo_limpo = ticker.replace(".SA", "")
-            
-            lista_final.append({
-                "Ativo": simbolo_limpo,
-                "Preço": f"R$ {preco_atual:.2f}",
-                "Var R$": f"{var_reais:+.2f}",
-                "Var %": f"{var_pct:+.2f}%",
-                "Status": "Alta" if var_reais > 0 else ("Baixa" if var_reais < 0 else "Neutro")
-            })
-
-        except KeyError:
-            print(f"Erro: Dados não encontrados para {ticker}")
-            continue
+    df_final = funcoes.buscar_resumo(tickers_formatados)
 
     fim = time.time()
     print(f"Tempo {fim - inicio:.2f}")
 
-    df_final = pd.DataFrame(lista_final)
-
     print("Sem Problemas")
     return df_final
 
@@ -177,16 +137,19 @@ def adicionar_acao( df_resultado):
             print(len(df_resultado))
             total = len(df_resultado)
 
-            for i, linha in df_resultado.iterrows():
+            # Os números só viram texto aqui, na hora de mostrar
+            df_exibicao = resumo.formatar_resumo(df_resultado)
+
+            for i, linha in df_exibicao.iterrows():
                 print(" ==================entrou no for ==========")
                 #print(linha)
                 ativo = linha['Ativo']
                 #  CALLBACK DA BARRA DE PROGRESSO 
                 print(f'0, atualizar_barra, {(i)+1}, {total}, Lendo {ativo}...')
 
-                preco = f"R$ {linha['Preço']}"
-                var_r = f"{linha['Var R$']}"
-                var_p = f"{linha['Var %']}%"
+                preco = linha['Preço']
+                var_r = linha['Var R$']
+                var_p = linha['Var %']
 
 
                 try:
@@ -201,6 +164,27 @@ def adicionar_acao( df_resultado):
         except Exception as x:
             print(f'Erro:  {x}')
 
+def coletar():
+    """Um ciclo de coleta: busca as cotações, salva o snapshot e o histórico no banco"""
+    bd_invest = classBanco.BaDa()
+    tickers_formatados = resumo.formatar_tickers(bd_invest.carregar_ticker())
+
+    funcoes.persistir(funcoes.buscar_resumo(tickers_formatados))
+
 if __name__ == "__main__":
-    d = processo_de_busca()
-    adicionar_acao(d)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Coleta de cotações da B3")
+    parser.add_argument("--uma-vez", action="store_true", help="busca uma vez e sai")
+    parser.add_argument("--intervalo", type=int, default=300, help="segundos entre as buscas durante o pregão")
+    args = parser.parse_args()
+
+    if args.uma_vez:
+        d = processo_de_busca()
+        adicionar_acao(d)
+    else:
+        agenda = agendador.Agendador(coletar, intervalo=args.intervalo)
+        try:
+            agenda.iniciar()
+        except KeyboardInterrupt:
+            print("Encerrando...")
+            agenda.parar()
+        funcoes.GRAVADOR.fechar()
@@ -4,16 +4,15 @@ from datetime import datetime
 import threading
 from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-import requests
 import webbrowser
-from bs4 import BeautifulSoup
-import yfinance as yf
 import time
 import os
 from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent.resolve() / 'arq' / 'src'))
 import funcoes
+import resumo
+import motor
 sys.path.append(str(Path(__file__).parent.parent.parent / 'banco' / 'connection'))
 import classBanco
 
@@ -152,8 +151,12 @@ class Main:
         self.label_data = tk.Label(self.frame_bottom, text="Carregando data...", font=("Arial", 10))
         self.label_data.pack(side="right") 
         self.atualizar_relogio() # Inicia o relógio
-        tn = threading.Thread(target= self.adiciona_noticia) 
-        tn.start()
+
+        # Um único loop asyncio (numa thread só) faz todo o acesso à rede
+        self.motor = motor.MotorAsync(baixador_lotes=funcoes.BAIXADOR)
+        self.ponte = motor.Ponte(self.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.fechar)
+        self.adiciona_noticia()
 
     def atualizar_relogio(self):
         """Atualiza o relógio no rodapé"""
@@ -161,47 +164,15 @@ class Main:
         self.label_data.config(text=f"{agora}")
         self.root.after(1000, self.atualizar_relogio)
 
-    def busca_noticia(self):
-        links = {
-            "https://investnews.com.br/economia/page/540/?_gl=1%2Ali6itt%2Agclid%2AQ2p3S0NBanctYi1rQmhCLUVpd0E0ZnZLckVuMS1NV1lpRWswLTJWalpSbURoX2tGTU43b3dWQXpKNE1tc3V0SnBMZkhKN3FzNXRESm1Cb0NELXNRQXZEX0J3RQ..%2A_gcl_aw%2AR0NMLjE2ODcyODU1NzIuQ2p3S0NBanctYi1rQmhCLUVpd0E0ZnZLckVuMS1NV1lpRWswLTJWalpSbURoX2tGTU43b3dWQXpKNE1tc3V0SnBMZkhKN3FzNXRESm1Cb0NELXNRQXZEX0J3RQ..&noamp=mobile&gad_source=1&gad_campaignid=17459268635&gclid=CjwKCAiAqKbMBhBmEiwAZ3UboPjtNpeA1nAIdZIkw3sKxjCBLdy0mo8WZ4oz3Hjq9ft6ih084H4oeRoC_ncQAvD_BwE": ["category-posts-content","h2"],
-            "https://g1.globo.com/economia/" : ["column areatemplate-esquerda large-15 large-offset-0 xlarge-14 xlarge-offset-1 float-left","h2"],
-            "https://www.infomoney.com.br/economia/" : ["max-w-9xl mx-auto","h2"],
-            "https://www.cnnbrasil.com.br/economia/": ["grid lg:grid-cols-3 lg:gap-8 lg:border-t lg:border-neutral-300 lg:py-0 lg:pb-8 lg:pt-8 lg:*:py-0","h2"],
-            "https://g1.globo.com/politica/": ["theme","h2"],
-            "https://www.cnnbrasil.com.br/politica/": ["lg:mt-2","h3"],
-            "https://noticias.uol.com.br/politica/": ["flex-wrap ","h3"],
-            "https://jovempan.com.br/noticias/politica": ["main col-md-8","h2"]
-        }
-
-        noticias = []
-
-        for link, acha in links.items():
-            try:
-                resposta = requests.get(link)
-                soup = BeautifulSoup(resposta.content, 'html.parser')
-                    
-                news_lista = soup.find(class_= f'{acha[0]}')
-                ultimas = news_lista.find_all(f'{acha[1]}')
-
-                noticias.append(ultimas)
-
-            except:
-                print(f'Erro no {link}' )
-        
-        dic_news={}
-
-        for news in ultimas:
-            link = news.find('a')
-            dic_news[f'{news.text}'] = link.attrs['href']
-            #print(f"Artigo: {news.text}\n  Link: {link.attrs['href']}")
-
-        return dic_news
-    
     def adiciona_noticia(self, tempo=100000):
         """Atualiza a barra de noticias automaticamente a cada um intervalo"""
-        NoticiaAntiga = self.noticias
+        self.ponte.enviar(self.motor.buscar_noticias(), ao_concluir=self.mostrar_noticias)
+        self.root.after(tempo, self.adiciona_noticia)
 
-        self.noticias = self.busca_noticia()
+    def mostrar_noticias(self, noticias):
+        """Redesenha o painel de notícias se alguma coisa mudou"""
+        NoticiaAntiga = self.noticias
+        self.noticias = noticias
         
         if self.noticias != NoticiaAntiga:
             for widget in self.frame_interno_news.winfo_children(): # Limpa noticias
@@ -211,105 +182,52 @@ class Main:
                 lbl = tk.Label(self.frame_interno_news, text=f"• {titulo}", 
                             fg="blue", cursor="hand2", font=("Arial", 10, "underline"), wraplength=280, justify="left")
                 lbl.pack(anchor="w", pady=5, padx=5)
-                # Evento de clique
-                lbl.bind("<Button-1>", lambda e: webbrowser.open_new(link))
-            
-        self.root.after(tempo, self.adiciona_noticia)
+                # Evento de clique (url=link guarda o link desta notícia, não o da última)
+                lbl.bind("<Button-1>", lambda e, url=link: webbrowser.open_new(url))
 
     def buscar_investimentos(self):
-        """Inicia a thread para não travar a tela"""
+        """Agenda a busca no loop assíncrono para não travar a tela"""
 
         self.progresso.pack(side="right", padx=5, pady=5,)  # Mostra a barra de progresso
         self.tree.delete(*self.tree.get_children()) # Limpa tabela
-        
-        #for widget in self.frame_interno_news.winfo_children(): # Limpa noticias
-        #    widget.destroy()
-        
-        # Inicia a thread para trabalhar em segundo plano
-        # with ThreadPoolExecutor() as exe:
-        #     result = exe.submit(funcoes.processo_de_busca)
-        t = threading.Thread(target= self.processo_de_busca) 
-        t.start()
-        
-    
-    def processo_de_busca(self):
 
-        inicio = time.time()
+        # Evita duas buscas ao mesmo tempo escrevendo na mesma tabela
+        self.search_button.state(["disabled"])
+        self.atualizar_barra(0, 1, "Baixando cotações...")
 
-        tickers_formatados = [t + ".SA" 
-                            if not t.endswith(".SA") else t 
-                            for t in self.lista_tickers]
-        
-        string_tickers = " ".join(tickers_formatados)
-
-        dados = yf.download(string_tickers, period="2d", group_by='ticker', threads=True, progress=False)
-
-        lista_final = []
-
-        for ticker in tickers_formatados:
-            try:
-                # Acessa os dados desse ticker
-                df_ativo = dados[ticker]
-                df_ativo = df_ativo.dropna()
-
-                if len(df_ativo) < 1:
-                    continue
-
-                # Pega preço atual
-                preco_atual = df_ativo['Close'].iloc[-1]
-                
-                # Tenta calcular variação
-                if len(df_ativo) >= 2:
-                    fechamento_ontem = df_ativo['Close'].iloc[-2]
-                    var_reais = preco_atual - fechamento_ontem
-                    var_pct = (var_reais / fechamento_ontem) * 100
-                else:
-                    var_reais = 0.0
-                    var_pct = 0.0
-
-                # Limpa o nome
-                simbolo_limpo = ticker.replace(".SA", "")
-                
-                lista_final.append({
-                    "Ativo": simbolo_limpo,
-                    "Preço": f"R$ {preco_atual:.2f}",
-                    "Var R$": f"{var_reais:+.2f}",
-                    "Var %": f"{var_pct:+.2f}%",
-                    "Status": "Alta" if var_reais > 0 else ("Baixa" if var_reais < 0 else "Neutro")
-                })
-
-            except KeyError:
-                print(f"Erro: Dados não encontrados para {ticker}")
-                continue
-
-        fim = time.time()
-        print(f"Tempo {fim - inicio:.2f}")
-
-        df_final = pd.DataFrame(lista_final)
-        t = threading.Thread(target= funcoes.salvar_dados, args=(df_final,)) 
-        t.start()
+        self.inicio_busca = time.time()
+        tickers_formatados = resumo.formatar_tickers(self.lista_tickers)
+
+        # Cada lote entra na tabela assim que termina de baixar
+        self.ponte.enviar(
+            self.motor.buscar_cotacoes(tickers_formatados, ao_lote=self.ponte.no_tk(self.receber_lote)),
+            ao_concluir=self.busca_concluida,
+            ao_falhar=self.busca_falhou,
+        )
+
+    def receber_lote(self, df_lote, concluidos, total):
+        self.adicionar_acao(resumo.formatar_resumo(df_lote))
+        self.atualizar_barra(concluidos, total, f"Baixados {concluidos} de {total}...")
+
+    def busca_concluida(self, df_final):
+        print(f"Tempo {time.time() - self.inicio_busca:.2f}")
+
+        if len(df_final) > 0:
+            funcoes.persistir(df_final)
 
         print("Sem Problemas")
-        self.adicionar_acao( df_final)
+        self.atualizar_barra(100, 100, "Concluído!")
+        self.search_button.state(["!disabled"])
+
+    def busca_falhou(self, erro):
+        self.status_label.config(text=f"Erro na busca: {erro}")
+        self.search_button.state(["!disabled"])
 
     def adicionar_acao(self, df_resultado):
-        """Adiciona uma linha na tabela com a cor certa"""
+        """Adiciona as linhas de um lote na tabela com a cor certa"""
         try:
-            total = len(df_resultado)
-            for i, linha in df_resultado.iterrows():
-                
-                ativo = linha['Ativo']
-                # BARRA DE PROGRESSO
-                self.root.after(0, self.atualizar_barra, i+1, total, f"Lendo {ativo}...")
-
-                preco = f"{linha['Preço']}"
-                var_r = f"{linha['Var R$']}"
-                var_p = f"{linha['Var %']}"
-
-            # Limpa formatação de texto para verificar se é positivo ou negativo
-            #valor_teste = float(var_reais.replace(",", ".").replace("+", ""))
-                
-                tag = linha['Status']
+            for linha in df_resultado.itertuples(index=False):
+                ativo, preco, var_r, var_p, tag = linha
 
                 self.tree.insert("", "end", values=(ativo, preco, var_r, var_p), tags=(tag,))
         except Exception as c:
@@ -322,6 +240,11 @@ class Main:
         self.status_label.config(text=mensagem)
         self.root.update_idletasks() # Força a interface a desenhar agora
 
+    def fechar(self):
+        self.ponte.fechar()
+        funcoes.GRAVADOR.fechar() # Grava o que ainda estiver na fila antes de sair
+        self.root.destroy()
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = Main(root)
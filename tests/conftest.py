@@ -0,0 +1,7 @@
+from pathlib import Path
+import sys
+
+raiz = Path(__file__).parent.parent
+sys.path.append(str(raiz / 'arq' / 'src'))
+sys.path.append(str(raiz / 'banco' / 'connection'))
+sys.path.append(str(Path(__file__).parent))
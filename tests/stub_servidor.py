@@ -0,0 +1,56 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Servidor HTTP local para testar o motor sem rede: cada caminho devolve (status, html, atraso)
+# e o servidor conta quantas requisições estiveram abertas ao mesmo tempo.
+
+
+class Stub:
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.trava = threading.Lock()
+        self.abertas = 0
+        self.maximo = 0
+        self.pedidos = []
+
+        stub = self
+
+        class Tratador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, html, atraso = stub.paginas.get(self.path, (404, "", 0))
+                with stub.trava:
+                    stub.pedidos.append(self.path)
+                    stub.abertas += 1
+                    stub.maximo = max(stub.maximo, stub.abertas)
+                try:
+                    time.sleep(atraso)
+                    corpo = html.encode("utf-8")
+                    self.send_response(status)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(corpo)))
+                    self.end_headers()
+                    self.wfile.write(corpo)
+                finally:
+                    with stub.trava:
+                        stub.abertas -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Tratador)
+        self.thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, caminho):
+        return f"http://127.0.0.1:{self.servidor.server_address[1]}{caminho}"
+
+    def fechar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def pagina(classe, manchetes, tag="h2"):
+    """HTML com um bloco `classe` e uma manchete <tag><a href> para cada (título, link)"""
+    itens = "".join(f'<{tag}><a href="{link}">{titulo}</a></{tag}>' for titulo, link in manchetes)
+    return f'<html><body><div class="outro"><h2><a href="/x">fora</a></h2></div><div class="{classe}">{itens}</div></body></html>'
@@ -0,0 +1,141 @@
+import asyncio
+import queue
+import threading
+import time
+
+import pytest
+
+import baixador
+import motor
+import provedores
+from stub_servidor import Stub, pagina
+
+
+@pytest.fixture
+def stub():
+    paginas = {
+        "/economia": (200, pagina("bloco", [("Juros sobem", "https://a/1"), ("Dólar cai", "https://a/2")]), 0),
+        "/politica": (200, pagina("lista", [("Votação adiada", "https://b/1")], tag="h3"), 0),
+        "/sem-bloco": (200, "<html><body><p>nada</p></body></html>", 0),
+        "/erro": (500, "falhou", 0),
+    }
+    for i in range(6):
+        paginas[f"/lenta{i}"] = (200, pagina("bloco", [(f"Lenta {i}", f"https://c/{i}")]), 0.2)
+    servidor = Stub(paginas)
+    yield servidor
+    servidor.fechar()
+
+
+class RootFalso:
+    """Faz o papel do Tk: guarda cada root.after numa fila, como o mainloop faria"""
+
+    def __init__(self):
+        self.fila = queue.Queue()
+
+    def after(self, ms, funcao, *args):
+        self.fila.put((funcao, args))
+
+    def processar(self, timeout=5):
+        funcao, args = self.fila.get(timeout=timeout)
+        funcao(*args)
+
+
+def test_noticias_juntam_todas_as_fontes(stub):
+    fontes = {
+        stub.url("/economia"): ["bloco", "h2"],
+        stub.url("/politica"): ["lista", "h3"],
+        stub.url("/sem-bloco"): ["bloco", "h2"],
+        stub.url("/erro"): ["bloco", "h2"],
+        "http://127.0.0.1:9/fechada": ["bloco", "h2"],
+    }
+    recebidas = []
+    noticias = asyncio.run(motor.MotorAsync(fontes=fontes, timeout=2).buscar_noticias(recebidas.append))
+
+    assert noticias == {"Juros sobem": "https://a/1", "Dólar cai": "https://a/2", "Votação adiada": "https://b/1"}
+    assert recebidas == [noticias]
+
+
+def test_noticias_respeitam_o_limite_global(stub):
+    fontes = {stub.url(f"/lenta{i}"): ["bloco", "h2"] for i in range(6)}
+
+    inicio = time.perf_counter()
+    noticias = asyncio.run(motor.MotorAsync(limite=2, fontes=fontes, timeout=5).buscar_noticias())
+    tempo = time.perf_counter() - inicio
+
+    assert len(noticias) == 6
+    assert stub.maximo == 2
+    # 6 páginas de 0,2 s, duas por vez: 3 rodadas
+    assert 0.55 < tempo < 2.0
+
+
+class ProvedorContado(provedores.ProvedorReplay):
+    """Replay que conta quantas chamadas ao provedor estiveram abertas ao mesmo tempo"""
+
+    def __init__(self, seguro):
+        super().__init__(latencia=0.05)
+        self.SEGURO_ENTRE_THREADS = seguro
+        self.trava = threading.Lock()
+        self.abertas = 0
+        self.maximo = 0
+
+    def baixar(self, tickers, **kwargs):
+        with self.trava:
+            self.abertas += 1
+            self.maximo = max(self.maximo, self.abertas)
+        try:
+            return super().baixar(tickers, **kwargs)
+        finally:
+            with self.trava:
+                self.abertas -= 1
+
+
+@pytest.mark.parametrize("seguro, esperado", [(False, 1), (True, 4)])
+def test_lotes_de_cotacoes_usam_o_limite_do_provedor(seguro, esperado):
+    provedor = ProvedorContado(seguro)
+    m = motor.MotorAsync(limite=8, baixador_lotes=baixador.Baixador(provedor=provedor, max_workers=4))
+
+    async def rodar():
+        lotes = [[f"T{i}{j}.SA" for j in range(3)] for i in range(8)]
+        return await asyncio.gather(*[m.buscar_lote(lote, {"period": "2d"}) for lote in lotes])
+
+    resultados = asyncio.run(rodar())
+
+    assert all(dados is not None and not dados.empty for _, dados in resultados)
+    assert provedor.maximo == esperado
+
+
+def test_lote_sem_cotacao_volta_vazio_e_nao_none():
+    provedor = provedores.ProvedorReplay(sem_dados=["MORTO.SA"])
+    m = motor.MotorAsync(baixador_lotes=baixador.Baixador(provedor=provedor, espera=0))
+
+    lote, dados = asyncio.run(m.buscar_lote(["MORTO.SA"], {"period": "2d"}))
+
+    assert lote == ["MORTO.SA"] and dados is not None and dados.empty
+
+
+def test_ponte_entrega_o_resultado_na_thread_do_tk(stub):
+    root = RootFalso()
+    ponte = motor.Ponte(root)
+    try:
+        m = motor.MotorAsync(fontes={stub.url("/economia"): ["bloco", "h2"]}, timeout=2)
+        recebidas = []
+        ponte.enviar(m.buscar_noticias(), ao_concluir=recebidas.append)
+        root.processar()
+        assert recebidas == [{"Juros sobem": "https://a/1", "Dólar cai": "https://a/2"}]
+
+        async def quebrar():
+            raise RuntimeError("falha no loop")
+
+        erros = []
+        ponte.enviar(quebrar(), ao_falhar=erros.append)
+        root.processar()
+        assert [str(e) for e in erros] == ["falha no loop"]
+
+        # no_tk: a função embrulhada não roda na hora, vai para a fila do Tk
+        chamadas = []
+        ponte.no_tk(chamadas.append)("lote")
+        assert chamadas == []
+        root.processar()
+        assert chamadas == ["lote"]
+    finally:
+        ponte.fechar()